@@ -8,30 +8,36 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(PROJECT_ROOT))
 
 from app.core.config import get_settings
-from app.core.database import Base
-
-from app.db import models  # noqa
 
 config = context.config
-fileConfig(config.config_file_name)
+# Skip logging setup when invoked programmatically without an ini file
+if config.config_file_name and os.path.exists(config.config_file_name):
+    fileConfig(config.config_file_name)
 settings = get_settings()
 config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
 
-target_metadata = Base.metadata
-
 def run_migrations_offline():
+    # Offline (--sql) runs only render DDL, so the model graph is not imported
     context.configure(url=settings.DATABASE_URL,
-                      target_metadata=target_metadata,
                       literal_binds=True,
                       compare_type=True)
     with context.begin_transaction():
         context.run_migrations()
 
 def run_migrations_online():
+    from app.core.database import Base
+    from app.db import models  # noqa
+
+    target_metadata = Base.metadata
+
+    # ALEMBIC_USE_POOL=1 keeps the engine's default QueuePool (e.g. when migrations
+    # are run programmatically several times in one process); NullPool by default.
+    engine_kwargs = dict(prefix="sqlalchemy.")
+    if os.getenv("ALEMBIC_USE_POOL") != "1":
+        engine_kwargs["poolclass"] = pool.NullPool
     connectable = engine_from_config(
         config.get_section(config.config_ini_section),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
+        **engine_kwargs,
     )
     with connectable.connect() as connection:
         context.configure(
@@ -17,25 +17,279 @@
 from __future__ import annotations
 
 import asyncio
-from typing import List, Optional
+import logging
+import multiprocessing
+import os
+import random
+import re
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
+import httpx
+from cachetools import TTLCache
+
+from .http_client import aclose_shared_client
 from .parser_agent import LamodaParser, Product
-from .product_parser import ModernLamodaParser, ProductDetails
+from .product_parser import RETRYABLE_STATUS, ModernLamodaParser, ProductDetails, parse_product_html
+
+__all__ = ["parse_catalog_items", "DynamicLimiter", "shutdown"]
+
+logger = logging.getLogger(__name__)
+
+
+_VALID_PRODUCT_URL = re.compile(r"^https?://.*?/p/").match
+_SKU_FROM_URL = re.compile(r"//([^/]+)/p/([^/?#]+)")
+
+# Кэш распарсенных карточек: SKU -> (время истечения, ProductDetails)
+_DETAILS_CACHE_SIZE = 4096
+_details_cache: "OrderedDict[str, Tuple[float, ProductDetails]]" = OrderedDict()
+
+
+def _cache_key(url: str) -> str:
+    """Канонический ключ карточки — домен + SKU из URL (трекинг-параметры отбрасываются)."""
+    match = _SKU_FROM_URL.search(url)
+    return f"{match.group(1)}/{match.group(2)}".lower() if match else url
+
+
+def _cache_get(key: str) -> Optional[ProductDetails]:
+    entry = _details_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, details = entry
+    if expires_at < time.monotonic():
+        del _details_cache[key]
+        return None
+    _details_cache.move_to_end(key)
+    return details
+
+
+def _cache_set(key: str, details: ProductDetails, ttl: float) -> None:
+    _details_cache[key] = (time.monotonic() + ttl, details)
+    _details_cache.move_to_end(key)
+    while len(_details_cache) > _DETAILS_CACHE_SIZE:
+        _details_cache.popitem(last=False)
+
+
+class DynamicLimiter:
+    """Ограничитель параллелизма с изменяемым лимитом.
+
+    В отличие от `asyncio.Semaphore`, лимит можно безопасно уменьшать
+    и увеличивать прямо во время работы (например, при HTTP 429 от Lamoda):
+    условие `active < capacity` перепроверяется при каждом пробуждении.
+    """
 
-__all__ = ["parse_catalog_items"]
+    def __init__(self, capacity: int):
+        self._capacity = max(1, capacity)
+        self._active = 0
+        self._cond = asyncio.Condition()
 
+    @property
+    def capacity(self) -> int:
+        return self._capacity
 
-async def _parse_single_item(parser: ModernLamodaParser, url: str, sem: asyncio.Semaphore) -> Optional[ProductDetails]:
-    """Внутренний хелпер для ограниченного параллельного парсинга карточек."""
-    async with sem:
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._active < self._capacity)
+            self._active += 1
+
+    async def release(self) -> None:
+        async with self._cond:
+            self._active -= 1
+            self._cond.notify(1)
+
+    async def resize(self, capacity: int) -> None:
+        async with self._cond:
+            self._capacity = max(1, capacity)
+            self._cond.notify_all()
+
+    async def __aenter__(self) -> "DynamicLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.release()
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    """Пауза перед повтором: Retry-After от сервера или экспонента с джиттером."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = exc.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+    return 0.5 * 2 ** attempt + random.random() * 0.25
+
+
+def _log_item_error(url: str, exc: BaseException) -> None:
+    # Тип исключения виден в логе; трейсбек — только в DEBUG
+    logger.warning("item-error %s: %r", url, exc, exc_info=logger.isEnabledFor(logging.DEBUG))
+
+
+async def _fetch_with_retry(
+    parser: ModernLamodaParser, url: str, limiter: DynamicLimiter, retries: int = 3
+) -> Optional[bytes]:
+    """Загрузка карточки с повтором на сетевых ошибках, 429 и 5xx.
+
+    Пауза между попытками выдерживается вне лимитера, чтобы не занимать слот.
+    """
+    last_exc: Optional[Exception] = None
+    for attempt in range(retries):
         try:
-            return await parser.parse_product_by_url(url)
-        except Exception as exc:
-            print(f"[item-error] {url}: {exc}")
+            async with limiter:
+                return await parser.fetch_page(url)
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code not in RETRYABLE_STATUS:
+                _log_item_error(url, exc)
+                return None
+            if exc.response.status_code == 429:
+                # Lamoda просит притормозить — уменьшаем параллелизм
+                await limiter.resize(limiter.capacity - 1)
+            last_exc = exc
+        except httpx.TransportError as exc:
+            last_exc = exc
+        except asyncio.CancelledError:
+            raise
+        except (httpx.HTTPError, httpx.InvalidURL, ValueError) as exc:
+            _log_item_error(url, exc)
             return None
+        if attempt + 1 < retries:
+            await asyncio.sleep(_retry_delay(last_exc, attempt))
+
+    logger.warning("give up %s: %r", url, last_exc)
+    return None
+
+
+async def _parse_single_item(
+    parser: ModernLamodaParser,
+    url: str,
+    limiter: DynamicLimiter,
+    cache_ttl: float = 0,
+    executor: Optional[Executor] = None,
+) -> Optional[ProductDetails]:
+    """Внутренний хелпер для ограниченного параллельного парсинга карточек.
+
+    Лимитер ограничивает только HTTP-загрузку; разбор HTML уходит в `executor`,
+    чтобы не блокировать event loop.
+    """
+    key = _cache_key(url)
+    if cache_ttl > 0:
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+
+    content = await _fetch_with_retry(parser, url, limiter)
+    if content is None:
+        return None
+
+    loop = asyncio.get_running_loop()
+    try:
+        details = await loop.run_in_executor(executor, parse_product_html, content, url, parser.domain)
+    except asyncio.CancelledError:
+        raise
+    except BrokenExecutor as exc:
+        # Ошибки разбора ловятся внутри воркера; сюда доходят только сбои пула
+        # (воркер убит OOM, упал в libxml2). Сломанный пул не восстанавливается —
+        # выбрасываем его, следующий вызов создаст новый, а эту карточку
+        # разбираем в потоке текущего процесса
+        _log_item_error(url, exc)
+        _discard_executor(executor)
+        details = await asyncio.to_thread(parse_product_html, content, url, parser.domain)
+
+    if details and cache_ttl > 0:
+        _cache_set(key, details, cache_ttl)
+    return details
+
+
+# Результаты поиска по каталогу: одинаковые запросы (например, от debounce в UI)
+# в течение минуты не ходят в Lamoda повторно
+_search_cache: "TTLCache[Tuple[str, str, int], List[Product]]" = TTLCache(maxsize=1024, ttl=60)
+# Замок живет, пока на него ссылается хоть один ожидающий запрос: запись
+# исчезает сама, и поздний запрос не получит новый замок, пока старый занят
+_search_locks: "weakref.WeakValueDictionary[Tuple[str, str, int], asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+async def _iter_catalog(
+    search_parser: LamodaParser, query: str, domain: str, limit: int
+) -> AsyncIterator[Product]:
+    """Поиск по каталогу через кэш; параллельные одинаковые запросы ждут один общий."""
+    key = (query, domain, limit)
+    cached = _search_cache.get(key)
+    if cached is None:
+        lock = _search_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            cached = _search_cache.get(key)
+            if cached is None:
+                collected: List[Product] = []
+                async for p in search_parser.aiter_search(query, limit=limit):
+                    collected.append(p)
+                    yield p
+                _search_cache[key] = collected
+                return
+
+    for p in cached:
+        yield p
+
+
+# Парсеры на домен живут весь срок приложения: пул соединений и keep-alive к
+# lamoda.* переиспользуются между вызовами. Клиент httpx привязан к event loop,
+# поэтому при смене цикла (asyncio.run в CLI/скриптах) пара пересоздаётся.
+_parsers: Dict[str, Tuple[LamodaParser, ModernLamodaParser, asyncio.AbstractEventLoop]] = {}
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_parsers(domain: str) -> Tuple[LamodaParser, ModernLamodaParser]:
+    loop = asyncio.get_running_loop()
+    entry = _parsers.get(domain)
+    if entry is None or entry[2] is not loop:
+        # Каталог и карточки ходят через общий HTTP/2 клиент (http_client)
+        entry = _parsers[domain] = (
+            LamodaParser(domain=domain),
+            ModernLamodaParser(domain=domain),
+            loop,
+        )
+    return entry[0], entry[1]
+
+
+# Пул создается лениво внутри уже многопоточного процесса (uvicorn, pubsub,
+# to_thread), поэтому воркеры запускаются через forkserver, а не fork: иначе
+# дети наследуют захваченные в момент fork блокировки. Число воркеров
+# ограничено — пул заводится в каждом воркере uvicorn
+_PARSE_WORKERS = int(os.getenv("LAMODA_PARSE_WORKERS", "0")) or min(4, os.cpu_count() or 1)
 
 
-async def parse_catalog_items(query: str, *, domain: str = "kz", limit: int = 20, concurrency: int = 5) -> List[ProductDetails]:
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("forkserver"),
+        )
+    return _executor
+
+
+def _discard_executor(executor: Optional[Executor]) -> None:
+    """Забыть сломанный общий пул процессов (если это он)."""
+    global _executor
+    if executor is not None and executor is _executor:
+        _executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def shutdown() -> None:
+    """Закрывает общий HTTP-клиент парсеров и пул процессов (хук для shutdown приложения)."""
+    global _executor
+    _parsers.clear()
+    await aclose_shared_client()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def parse_catalog_items(
+    query: str, *, domain: str = "kz", limit: int = 20, concurrency: int = 5, cache_ttl: float = 0
+) -> List[ProductDetails]:
     """Полный цикл парсинга: каталог → карточки товаров.
 
     Args:
@@ -43,46 +297,72 @@ async def parse_catalog_items(query: str, *, domain: str = "kz", limit: int = 20
         domain: Домен Lamoda (`kz`, `ru`, `by`).
         limit: Максимум товаров для детального парсинга.
         concurrency: Количество одновременных запросов к карточкам.
+        cache_ttl: Время жизни (сек) кэша распарсенных карточек; 0 — без кэша.
     """
-    # 1. Получаем список товаров из каталога
-    search_parser = LamodaParser(domain=domain)
+    search_parser, item_parser = _get_parsers(domain)
+
+    limiter = DynamicLimiter(concurrency)
+    executor = _get_executor()
+
+    # 1. Идём по каталогу и сразу запускаем парсинг карточек по мере появления URL,
+    #    не дожидаясь окончания сканирования каталога
+    #    Один SKU часто повторяется (цветовые варианты, пересечение страниц) — дедуплицируем
+    pending = set()
+    seen_keys = set()
+    catalog_count = 0
+    catalog_sample: List[Product] = []
     try:
-        catalog_products: List[Product] = await search_parser.afetch_search(query, limit=limit)
-    finally:
-        await search_parser.close()
+        async for p in _iter_catalog(search_parser, query, domain, limit):
+            catalog_count += 1
+            if len(catalog_sample) < 5:
+                catalog_sample.append(p)
+            url = p.url
+            if url and _VALID_PRODUCT_URL(url):
+                key = _cache_key(url)
+                if key in seen_keys:
+                    continue
+                seen_keys.add(key)
+                pending.add(asyncio.create_task(_parse_single_item(item_parser, url, limiter, cache_ttl, executor)))
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        raise
 
-    if not catalog_products:
-        print("Found 0 products via real search")
+    if not catalog_count:
+        logger.info("Found 0 products via real search")
         return []
 
-    print(f"Found {len(catalog_products)} products via real search")
-
-    # 2. Формируем список URL карточек (пропускаем пустые и фейковые)
-    product_urls = []
-    for p in catalog_products:
-        if p.url and p.url.startswith('http') and '/p/' in p.url:
-            product_urls.append(p.url)
-    
-    if not product_urls:
-        print("No products have valid URLs for detailed parsing")
-        print("Found products from catalog search (for reference only):")
-        for i, p in enumerate(catalog_products[:5], 1):
-            print(f"  {i}. {p.brand} - {p.name} - {p.price}₸ (URL: {p.url or 'NO URL'})")
+    logger.info("Found %d products via real search", catalog_count)
+
+    if not pending:
+        logger.info("No products have valid URLs for detailed parsing")
+        logger.info("Found products from catalog search (for reference only):")
+        for i, p in enumerate(catalog_sample, 1):
+            logger.info("  %d. %s - %s - %s₸ (URL: %s)", i, p.brand, p.name, p.price, p.url or 'NO URL')
         return []
 
-    print(f"Products with valid URLs: {len(product_urls)}/{len(catalog_products)}")
-    # 3. Детальное парсирование карточек
-    item_parser = ModernLamodaParser(domain=domain)
-    semaphore = asyncio.Semaphore(max(1, concurrency))
+    logger.info(
+        "Products with valid URLs: %d/%d (deduped: %d)",
+        len(pending), catalog_count, catalog_count - len(pending),
+    )
 
+    # 2. Забираем карточки по мере готовности и останавливаемся, как только набрали лимит
+    results: List[ProductDetails] = []
     try:
-        tasks = [_parse_single_item(item_parser, url, semaphore) for url in product_urls]
-        details: List[Optional[ProductDetails]] = await asyncio.gather(*tasks)
+        for next_done in asyncio.as_completed(pending):
+            details = await next_done
+            if details:
+                results.append(details)
+                if len(results) >= limit:
+                    break
     finally:
-        await item_parser.close()
+        for task in pending:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
 
-    # 4. Фильтруем неуспехи и обрезаем до лимита
-    return [d for d in details if d][:limit]
+    return results
 
 
 # CLI интерфейс --------------------------------------------------------------
@@ -90,16 +370,56 @@ if __name__ == "__main__":
     import argparse
     from dataclasses import asdict
     import json
+    import logging.handlers
+    import queue
+    import sys
 
     cli = argparse.ArgumentParser(description="Lamoda catalog → item parser")
     cli.add_argument("query", help="Поисковый запрос, напр. 'nike кроссовки'")
     cli.add_argument("--domain", choices=["kz", "ru", "by"], default="kz", help="Домен Lamoda")
     cli.add_argument("--limit", type=int, default=20, help="Максимум товаров")
     cli.add_argument("--concurrency", type=int, default=5, help="Одновременные запросы к карточкам")
+    cli.add_argument("--cache-ttl", type=float, default=3600, help="TTL кэша карточек в секундах (0 — без кэша)")
+    cli.add_argument("--ndjson", action="store_true", help="Выводить по одному JSON-объекту на строку")
     args = cli.parse_args()
 
     async def _main():
-        results = await parse_catalog_items(args.query, domain=args.domain, limit=args.limit, concurrency=args.concurrency)
-        print(json.dumps([asdict(r) for r in results], ensure_ascii=False, indent=2))
+        try:
+            results = await parse_catalog_items(
+                args.query, domain=args.domain, limit=args.limit,
+                concurrency=args.concurrency, cache_ttl=args.cache_ttl,
+            )
+        finally:
+            await shutdown()
+        # Пишем по одной записи, не собирая весь список словарей и итоговую строку в памяти
+        out = sys.stdout
+        if args.ndjson:
+            for r in results:
+                out.write(json.dumps(asdict(r), ensure_ascii=False))
+                out.write("\n")
+            return
+
+        out.write("[")
+        for i, r in enumerate(results):
+            out.write(",\n" if i else "\n")
+            json.dump(asdict(r), out, ensure_ascii=False)
+        out.write("\n]\n" if results else "]\n")
 
-    asyncio.run(_main()) 
\ No newline at end of file
+    # uvloop заметно дешевле стандартного цикла на сотнях одновременных сокетов
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
+    # Логи пишутся в stderr из отдельного потока, чтобы I/O не блокировал event loop
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+    log_listener = logging.handlers.QueueListener(log_queue, log_handler)
+    logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(log_queue)])
+    log_listener.start()
+    try:
+        asyncio.run(_main())
+    finally:
+        log_listener.stop() 
\ No newline at end of file
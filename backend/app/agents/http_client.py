@@ -0,0 +1,44 @@
+"""
+Общий HTTP-клиент парсеров Lamoda.
+
+Все парсеры (каталог и карточки) ходят на один и тот же origin, поэтому
+используют один пул соединений с keep-alive и HTTP/2: TLS-рукопожатие
+платится один раз, дальше запросы мультиплексируются.
+
+Клиент httpx привязан к event loop, в котором открыты его соединения,
+поэтому клиенты ведутся по циклу (asyncio.run в синхронных обертках
+создает новый цикл).
+"""
+
+import asyncio
+import weakref
+
+import httpx
+
+__all__ = ["get_shared_client", "aclose_shared_client"]
+
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    """Общий клиент текущего event loop (создается при первом обращении)"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0),
+        )
+    return client
+
+
+async def aclose_shared_client() -> None:
+    """Закрыть общий клиент текущего event loop (хук завершения приложения/CLI)"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
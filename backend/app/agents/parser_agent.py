@@ -8,15 +8,23 @@ Lamoda Parser Agent
 
 import asyncio
 import json
+import logging
 import re
 import random
 import time
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
-from urllib.parse import urljoin, urlparse, parse_qs, quote
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
+from urllib.parse import urlparse, parse_qs, quote
 
 import httpx
-from bs4 import BeautifulSoup
+import orjson
+import soupsieve as sv
+from bs4 import BeautifulSoup, SoupStrainer
+
+from .http_client import aclose_shared_client, get_shared_client
+
+logger = logging.getLogger(__name__)
 
 # Конфигурация доменов
 LAMODA_DOMAINS = {
@@ -25,7 +33,365 @@ LAMODA_DOMAINS = {
     "by": {"host": "https://www.lamoda.by", "currency": "р."}
 }
 
-@dataclass
+# Демо-товары по бренду из запроса: (название, бренд, цена, старая цена)
+_DEMO_TEMPLATES: Dict[str, Tuple[Tuple[str, str, float, Optional[float]], ...]] = {
+    'nike': (
+        ('Nike Air Max 270', 'Nike', 12990.0, 15990.0),
+        ('Nike React Infinity Run', 'Nike', 9990.0, None),
+        ('Nike Air Force 1', 'Nike', 8990.0, 10990.0),
+    ),
+    'adidas': (
+        ('Adidas Ultraboost 22', 'Adidas', 14990.0, None),
+        ('Adidas Stan Smith', 'Adidas', 6990.0, 8990.0),
+        ('Adidas Gazelle', 'Adidas', 7990.0, None),
+    ),
+    'puma': (
+        ('Puma Suede Classic', 'Puma', 5990.0, None),
+        ('Puma RS-X', 'Puma', 8990.0, 11990.0),
+        ('Puma Future Rider', 'Puma', 6990.0, None),
+    ),
+}
+_DEMO_BRAND_TOKENS = tuple(_DEMO_TEMPLATES)
+
+# Регулярные выражения компилируются один раз при импорте модуля
+_TAG_RE = re.compile(r'<[^>]+>')
+_PRICE_RE = re.compile(r'\b(\d{1,3}(?:\s+\d{3})*)\b')
+_FALLBACK_PRICE_RE = re.compile(r'\b(\d{3,7})\b')
+_ELEMENT_PRICE_RE = re.compile(r'(\d{1,3}(?:\s+\d{3})*)\s*[₸₽]')
+_TRAIL_NUM_RE = re.compile(r'\s+\d+\s*$')
+_MULTI_WS_RE = re.compile(r'\s{2,}')
+_WS_RE = re.compile(r'\s+')
+_NUMBERS_RE = re.compile(r'\d+(?:\s+\d+)*')
+_NON_WORD_RE = re.compile(r'[^\w\s\-]')
+_URL_SKU_END_RE = re.compile(r'/([A-Z0-9]+)/?(?:\?|$)')
+_URL_SKU_RE = re.compile(r'/([A-Z0-9]+)/')
+_BLOCK_PRICE_RE = re.compile(r'(\d+(?:\s+\d+)*)\s*₸')
+_BLOCK_PRICE_NO_CURRENCY_RE = re.compile(r'(\d+(?:\s+\d+){1,2})')
+
+# Паттерны для поиска JSON с товарами в <script> (старые методы).
+# Литерал рядом с паттерном обязателен для совпадения: если его нет в тексте
+# скрипта, дорогой regex-проход по телу скрипта пропускается.
+_JSON_PATTERNS = [
+    (literal, re.compile(p, re.DOTALL)) for literal, p in (
+        # Основной паттерн для Lamoda
+        ('"products"', r'"products"\s*:\s*(\[[\s\S]*?\])'),
+        ('window.__INITIAL_STATE__', r'window\.__INITIAL_STATE__\s*=\s*({[\s\S]*?});'),
+        ('window.dataLayer', r'window\.dataLayer\s*=\s*(\[[\s\S]*?\]);'),
+        ('window.__NEXT_DATA__', r'window\.__NEXT_DATA__\s*=\s*({[\s\S]*?});'),
+        # Дополнительные паттерны
+        ('catalogsearch', r'catalogsearch.*?"products"\s*:\s*(\[[\s\S]*?\])'),
+        ('"catalog"', r'"catalog"\s*:\s*{[\s\S]*?"items"\s*:\s*(\[[\s\S]*?\])'),
+    )
+]
+
+# Паттерны текстового fallback-парсинга (цены в тенге) одной альтернацией,
+# чтобы текст страницы сканировался один раз; ветка определяется по m.lastgroup
+_TEXT_PRODUCT_RE = re.compile(
+    # Паттерн 1: Цена + валюта + бренд + название
+    r'(?P<p1_price>\d{2,6}(?:\s+\d{3})*)\s*₸\s*(?P<p1_brand>[A-Za-z]+)\s+(?P<p1_name>[А-Яа-я\s\w\-]{10,80})'
+    # Паттерн 2: Бренд + название + цена
+    r'|(?P<p2_brand>[A-Za-z]+)\s+(?P<p2_name>[А-Яа-я\s\w\-]{10,80})\s+(?P<p2_price>\d{2,6}(?:\s+\d{3})*)\s*₸'
+    # Паттерн 3: Только цены от 1000 до 999999 тенге
+    r'|(?P<p3_price>\d{4,6})\s*₸',
+    re.IGNORECASE,
+)
+
+
+# Ключи JSON, под которыми обычно лежат списки товаров
+_PRODUCT_KEYS = ('products', 'items', 'catalog', 'results', 'data')
+_PRODUCT_KEY_SET = frozenset(_PRODUCT_KEYS)
+
+_JSON_DECODER = json.JSONDecoder()
+
+# Повторы при HTTP 429 и число одновременно загружаемых страниц поиска
+_MAX_RATE_LIMIT_RETRIES = 4
+_MAX_PARALLEL_PAGES = 3
+_MAX_CARD_IMAGES = 10  # предел галереи одной карточки
+_MAX_BACKOFF = 30.0
+
+# Селекторы цен на основе реальной структуры Lamoda; каждая группа скомпилирована
+# в одно объединение, чтобы карточка обходилась один раз, а не по разу на селектор
+_SEL_NEW_PRICE = sv.compile(
+    '.x-product-card-description__price-new, span[class*="price-new"], '
+    'span[class*="price_new"], .product-card__price_new'
+)
+_SEL_OLD_PRICE = sv.compile(
+    '.x-product-card-description__price-old, .x-product-card-description__price-second-old, '
+    'span[class*="price-old"], span[class*="price_old"], .product-card__price_old'
+)
+_SEL_SINGLE_PRICE = sv.compile(
+    '.x-product-card-description__price-single, span[class*="price-single"], span[class*="price_single"], '
+    '.product-card__price:not([class*="old"]):not([class*="new"])'
+)
+
+# Теги, которые парсер реально читает на странице поиска. SoupStrainer отбрасывает
+# остальные элементы верхнего уровня (<style>, <svg>, <link>, <meta> и т.п.), не
+# создавая для них объекты Tag; вложенные в сохраненные теги элементы остаются.
+# <script> нужен для извлечения встроенного JSON с товарами.
+PRODUCT_STRAINER = SoupStrainer(
+    ['a', 'article', 'div', 'img', 'span', 'h1', 'h2', 'h3', 'h4', 'li', 'script']
+)
+
+# Признаки карточки старой структуры: одна проверка вместо трех обходов блока
+_SEL_CARD_MARKERS = sv.compile(
+    '.product-card__brand-name, .product-card__product-name, .product-card__price'
+)
+
+# Селекторы карточек, скомпилированные один раз: в циклах по карточкам soupsieve
+# иначе на каждый вызов ищет строку селектора в своем кэше компиляции.
+# Порядок в списках важен — это приоритет стратегий, поэтому они не объединены через запятую.
+_SEL_PRODUCT_BLOCKS = [(selector, sv.compile(selector)) for selector in (
+    # Селекторы для современного Lamoda
+    'a[href*="/p/"]',  # Прямые ссылки на товары
+    'div[class*="product"] a[href]',  # Ссылки внутри блоков товаров
+    'article a[href]',  # Ссылки в article элементах
+    '.product-card a[href]',  # Старые селекторы
+    '.product-card',
+    '.product-item',
+    '.catalog-item',
+    '.item-card',
+    # Селекторы на основе классов
+    '[class*="product"]',
+    '[class*="item"]',
+    '[class*="card"]',
+    # Структурные селекторы
+    'article',
+    '.grid-item',
+    'li[class*="item"]',
+)]
+_SEL_NAMES = [sv.compile(selector) for selector in (
+    'h3[class*="title"]',
+    'div[class*="title"]',
+    'span[class*="title"]',
+    '[data-testid*="title"]',
+    '[data-testid*="name"]',
+    'h1, h2, h3, h4',
+    '.product-card__product-name',  # Старый селектор
+)]
+_SEL_BRANDS = [sv.compile(selector) for selector in (
+    'span[class*="brand"]',
+    'div[class*="brand"]',
+    '[data-testid*="brand"]',
+    '.product-card__brand-name',  # Старый селектор
+)]
+_SEL_PRODUCT_LINK = sv.compile('a[href*="/p/"]')
+_SEL_ANY_LINK = sv.compile('a[href]')
+_SEL_CARD_LINKS = [sv.compile('.product-card__hit-area[href]'), _SEL_PRODUCT_LINK, _SEL_ANY_LINK]
+_SEL_BLOCK_LINKS = [_SEL_PRODUCT_LINK, _SEL_ANY_LINK]
+_SEL_CARD_BRAND = sv.compile('.product-card__brand-name')
+_SEL_CARD_NAME = sv.compile('.product-card__product-name')
+_SEL_CARD_PIC = sv.compile('.product-card__pic-img')
+
+# Изображение товара: хост Lamoda/CDN (с учетом регистра) и расширение картинки
+# (без учета регистра) где угодно в URL — одна проверка вместо пяти подстрок
+_is_product_image_url = re.compile(r'(?=.*(?:lmcdn\.ru|lamoda)).*\.(?i:jpe?g|png|webp)').match
+
+_CURRENCY_TRANS = str.maketrans('', '', '₸₽')
+
+_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Известные бренды — единый список для всех эвристик определения бренда;
+# ключи в нижнем регистре для O(1) поиска
+_KNOWN_BRANDS = (
+    'Nike', 'Adidas', 'Puma', 'Reebok', 'Jordan', 'Converse', 'New Balance',
+    'Vans', 'Under Armour', 'Asics', 'Mizuno', 'Skechers', 'Fila', 'Kappa',
+    'Umbro', 'Diadora', 'Calvin Klein', 'Tommy Hilfiger', 'Lacoste', 'Polo Ralph Lauren',
+    'Hugo Boss', 'Demix', 'Outventure', 'Baon', 'Befree', 'Mango', 'Zara', 'H&M', 'Uniqlo',
+    'Euphoria', 'Profit', 'Terranova', 'Pepe Jeans', 'Marco Tozzi', 'Tamaris',
+    'Founds', 'Nume', 'Shoiberg', 'T.Taccardi', 'Abricot', 'Pierre Cardin',
+)
+_KNOWN_BRANDS_LOWER = {b.lower(): b for b in _KNOWN_BRANDS}
+# Все бренды одной альтернацией: один проход по тексту вместо поиска каждого бренда.
+# Длинные названия раньше коротких, чтобы "Polo Ralph Lauren" не уступал более короткому совпадению.
+# Границы слова обязательны: короткие бренды ("Fila", "Nume") иначе находятся внутри обычных слов
+_BRAND_RE = re.compile(
+    r'(?<!\w)(?:' + '|'.join(re.escape(b) for b in sorted(_KNOWN_BRANDS, key=len, reverse=True)) + r')(?!\w)',
+    re.IGNORECASE,
+)
+
+
+def _loads(data):
+    """Быстрый разбор JSON (orjson принимает и str, и bytes)"""
+    return orjson.loads(data)
+
+
+def _iter_images(element):
+    """Лениво перебрать <img> внутри элемента, не собирая список всех потомков"""
+    for node in element.descendants:
+        if getattr(node, 'name', None) == 'img':
+            yield node
+
+
+def _image_key(url: str) -> str:
+    """Ключ изображения для дедупликации: путь без схемы и хоста CDN"""
+    return url.split('/', 3)[-1]
+
+
+def _normalize_price(price_str: str) -> float:
+    """Цена из строки с разделителями разрядов: "15 990" -> 15990.0"""
+    return float(price_str.replace(' ', ''))
+
+
+def _parse_grouped_price(text: str) -> Optional[float]:
+    """Разбор цены вида "15 990" / "2350" без regex.
+
+    Возвращает None, если текст не целиком из цены или цена вне разумных пределов —
+    тогда работает обычный regex-разбор.
+    """
+    # Только обычные пробелы: остальной whitespace оставляем regex-разбору
+    parts = [p for p in text.split(' ') if p]
+    if not parts or not all(p.isdecimal() for p in parts):
+        return None
+    if len(parts) == 1:
+        if len(parts[0]) > 7:
+            return None
+    elif len(parts[0]) > 3 or any(len(p) != 3 for p in parts[1:]):
+        return None
+    price = float(''.join(parts))
+    return price if 100 <= price <= 10000000 else None
+
+
+def _split_brand_and_name(text: str) -> Tuple[str, str]:
+    """Извлечь бренд и название из текста.
+
+    Чистая функция без состояния парсера с полными аннотациями — кандидат
+    на компиляцию mypyc/Cython без изменения вызывающего кода.
+    """
+    # Очищаем текст от лишних символов
+    text = text.translate(_CURRENCY_TRANS)
+    text = _NUMBERS_RE.sub('', text)  # Убираем цены
+    text = ' '.join(text.split())  # Нормализуем пробелы
+    
+    brand = "Unknown"
+    name = "Product"
+    
+    # Ищем бренд в тексте (первое вхождение любого известного бренда)
+    brand_match = _BRAND_RE.search(text)
+    if brand_match:
+        brand = _KNOWN_BRANDS_LOWER[brand_match.group().lower()]
+        # Берем текст после бренда как название
+        name_part = text[brand_match.end():].strip()
+        if name_part:
+            # Берем первые несколько слов как название
+            name_words = name_part.split()[:5]
+            if name_words:
+                name = ' '.join(name_words)
+    
+    # Если бренд не найден, пробуем извлечь из начала текста
+    if brand == "Unknown":
+        words = text.split()
+        if words:
+            # Первое слово может быть брендом
+            first_word = words[0]
+            if len(first_word) > 2 and first_word.isalpha():
+                brand = first_word
+                if len(words) > 1:
+                    name = ' '.join(words[1:6])  # Берем следующие 5 слов
+    
+    # Очищаем название от лишних символов
+    name = _NON_WORD_RE.sub('', name).strip()
+    if not name or len(name) < 3:
+        name = "Product"
+    
+    return brand, name
+
+
+@lru_cache(maxsize=4096)
+def _generate_sku_from_url(url: str, domain: str, index: int = 0) -> str:
+    """Генерирует SKU из URL товара (чистая функция: кэш по URL, домену и индексу)"""
+    try:
+        # Извлекаем код товара из URL
+        # Формат: https://www.lamoda.kz/p/mp002xw0zg9n/clothes-terranova-bryuki/
+        # Нужен артикул: mp002xw0zg9n
+        path_parts = urlparse(url).path.strip('/').split('/')
+        
+        # Ищем часть после /p/
+        if len(path_parts) >= 2 and path_parts[0] == 'p':
+            article_code = path_parts[1]
+            if len(article_code) >= 8 and article_code.replace('-', '').isalnum():
+                return article_code.upper()
+        
+        # Fallback - ищем любую длинную алфавитно-цифровую часть
+        for part in path_parts:
+            if len(part) >= 8 and part.replace('-', '').replace('_', '').isalnum():
+                return part.upper()
+        
+        # Последний fallback
+        return f"LMD{domain.upper()}{index + 1:04d}"
+        
+    except Exception:
+        return f"LMD{domain.upper()}{index + 1:04d}"
+
+
+@lru_cache(maxsize=4096)
+def _extract_price_cached(text: str) -> Optional[float]:
+    """Извлечение цены из текста карточки.
+
+    Чистая функция модульного уровня: тексты цен на странице сильно повторяются
+    ("15 990 ₸"), поэтому результат кэшируется.
+    """
+    # Очищаем от HTML тегов и лишних символов
+    if '<' in text:
+        text = _TAG_RE.sub('', text)
+    
+    # Убираем валютные символы но сохраняем контекст: ₸/₽ — одним проходом translate,
+    # двухсимвольный "р." — только если он вообще встречается
+    clean_text = text.translate(_CURRENCY_TRANS)
+    if 'р.' in clean_text:
+        clean_text = clean_text.replace('р.', '')
+    clean_text = clean_text.strip()
+    
+    # Быстрый путь: текст целиком состоит из цены ("15 990") — без regex
+    price = _parse_grouped_price(clean_text)
+    if price is not None:
+        return price
+    
+    # Паттерн для цен с пробелами (стандартный формат Lamoda)
+    # Например: "15 990", "2 350", "125 000". Нужно только первое совпадение —
+    # search останавливается на нем, не сканируя остаток текста
+    match = _PRICE_RE.search(clean_text)
+    
+    if match:
+        price_str = match.group(1).replace(' ', '')
+        try:
+            price = float(price_str)
+            # Проверяем разумность цены (от 100 до 10 млн тенге/рублей)
+            if 100 <= price <= 10000000:
+                return price
+        except ValueError:
+            pass
+    
+    # Fallback: первое число без пробелов в разумных пределах (только цифры —
+    # float не падает); finditer останавливается на первом подходящем
+    return next(
+        (price for price in (float(m.group(1)) for m in _FALLBACK_PRICE_RE.finditer(clean_text))
+         if 100 <= price <= 10000000),
+        None,
+    )
+
+
+@lru_cache(maxsize=None)
+def _build_fallback_patterns(currency_symbol: str) -> Tuple[re.Pattern, ...]:
+    """Паттерны regex fallback-парсинга для валюты домена (общие для всех экземпляров)
+
+    `(?<!\\d)` перед первой группой цифр не дает начинать совпадение с середины
+    длинной цифровой последовательности (артикулы, хэши в скриптах): иначе движок
+    перебирает каждую позицию внутри нее с квадратичным backtracking.
+    """
+    cur = re.escape(currency_symbol)
+    return tuple(
+        re.compile(p, re.MULTILINE | re.IGNORECASE) for p in (
+            # Основной паттерн: множественные цены + бренд + название
+            rf'(?<!\d)(\d{{1,3}}(?:\s+\d{{3}})*)\s*(\d{{1,3}}(?:\s+\d{{3}})*)\s*(\d{{1,3}}(?:\s+\d{{3}})*)\s*{cur}\s+([A-Z][A-Za-z\s&\.]+?)\s+([\w\s\-а-яё\.,"\'()]+?)(?=\d{{1,3}}(?:\s+\d{{3}})*\s*(?:\d{{1,3}}(?:\s+\d{{3}})*\s*)*{cur}|$)',
+            # Паттерн с двумя ценами
+            rf'(?<!\d)(\d{{1,3}}(?:\s+\d{{3}})*)\s*(\d{{1,3}}(?:\s+\d{{3}})*)\s*{cur}\s+([A-Z][A-Za-z\s&\.]+?)\s+([\w\s\-а-яё\.,"\'()]+?)(?=\d{{1,3}}(?:\s+\d{{3}})*\s*(?:\d{{1,3}}(?:\s+\d{{3}})*\s*)*{cur}|$)',
+            # Простой паттерн: цена + бренд + название
+            rf'(?<!\d)(\d{{1,3}}(?:\s+\d{{3}})*)\s*{cur}\s+([A-Z][A-Za-z\s&\.]+?)\s+([\w\s\-а-яё\.,"\'()]+?)(?=\d{{1,3}}(?:\s+\d{{3}})*\s*{cur}|$)',
+        )
+    )
+
+
+@dataclass(slots=True, frozen=True)
 class Product:
     sku: str
     name: str
@@ -34,26 +400,29 @@ class Product:
     old_price: Optional[float]
     url: str
     image_url: str  # Основное изображение для обратной совместимости
-    image_urls: List[str]  # Список всех изображений товара
+    image_urls: Tuple[str, ...]  # Все изображения товара (неизменяемый кортеж)
 
 
 class LamodaParser:
-    def __init__(self, domain: str = "ru"):
+    # Общие HTTP клиенты по домену: все экземпляры парсера переиспользуют один пул
+    # соединений. Клиент httpx привязан к event loop, поэтому словарь ведется на цикл.
+    def __init__(self, domain: str = "ru", session: Optional[httpx.AsyncClient] = None):
         if domain not in LAMODA_DOMAINS:
             raise ValueError(f"Unsupported domain: {domain}")
         
         self.domain = domain
         self.base_url = LAMODA_DOMAINS[domain]["host"]
+        self._base_prefix = self.base_url.rstrip('/')
         self.currency = LAMODA_DOMAINS[domain]["currency"]
+        self._fallback_patterns = _build_fallback_patterns(self.currency)
         
         # Более реалистичные заголовки для обхода блокировок
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
             'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8,kk;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': 'zstd, br, gzip',
             'DNT': '1',
-            'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
             'Sec-Fetch-Dest': 'document',
             'Sec-Fetch-Mode': 'navigate',
@@ -65,88 +434,100 @@ class LamodaParser:
             'sec-ch-ua-platform': '"Windows"',
         }
         
-        # Создаем сессию для повторного использования соединений
-        self.session = None
+        # Внешняя сессия или общий HTTP/2 клиент — парсер их не закрывает
+        self.session = session
+        
+        # Не больше 5 одновременных запросов; пауза между ними появляется
+        # только после ответов 429 и затухает на успешных ответах
+        self._request_slots = asyncio.Semaphore(5)
+        self._backoff = 0.0
 
     async def _get_session(self):
-        """Получить или создать HTTP сессию"""
-        if self.session is None:
-            timeout = httpx.Timeout(30.0, connect=10.0)
-            self.session = httpx.AsyncClient(
-                headers=self.headers,
-                timeout=timeout,
-                follow_redirects=True,
-                limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
-            )
-        return self.session
+        """Получить HTTP сессию: внешнюю или общий клиент текущего event loop"""
+        return self.session or get_shared_client()
+
+    @classmethod
+    async def aclose_shared(cls) -> None:
+        """Закрыть общий HTTP клиент текущего event loop"""
+        await aclose_shared_client()
 
     async def _make_request(self, url: str, **kwargs) -> Optional[httpx.Response]:
         """Выполнить HTTP запрос с обработкой ошибок"""
         session = await self._get_session()
         
         try:
-            # Добавляем случайную задержку для имитации человеческого поведения
-            await asyncio.sleep(random.uniform(0.5, 1.5))
-            
-            response = await session.get(url, **kwargs)
-            
-            if response.status_code == 429:  # Too Many Requests
-                print(f"Rate limited, waiting...")
-                await asyncio.sleep(random.uniform(5, 10))
-                return await self._make_request(url, **kwargs)
+            async with self._request_slots:
+                response = await self._get_with_backoff(session, url, **kwargs)
             
             if response.status_code in [200, 301, 302]:
                 return response
-            else:
-                print(f"HTTP {response.status_code} for {url}")
-                return None
+            
+            logger.warning("HTTP %s for %s", response.status_code, url)
+            return None
             
         except Exception as e:
-            print(f"Request failed for {url}: {e}")
+            logger.warning("Request failed for %s: %s", url, e)
             return None
 
+    async def _get_with_backoff(self, session: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+        """GET с повтором при 429; пауза перед запросом только после недавних 429"""
+        for attempt in range(_MAX_RATE_LIMIT_RETRIES + 1):
+            if self._backoff:
+                await asyncio.sleep(self._backoff * random.uniform(0.5, 1.5))
+            
+            response = await session.get(url, headers=self.headers, **kwargs)
+            
+            if response.status_code == 429:  # Too Many Requests
+                # Сервер просит притормозить — увеличиваем паузу для следующих запросов
+                self._backoff = min(max(self._backoff * 2, 1.0), _MAX_BACKOFF)
+                if attempt == _MAX_RATE_LIMIT_RETRIES:
+                    break
+                # Экспоненциальная пауза (или Retry-After от сервера)
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt + random.random()
+                logger.warning("Rate limited, waiting %.1fs...", delay)
+                await asyncio.sleep(delay)
+                continue
+            
+            # Ответ без 429 — постепенно снимаем притормаживание
+            self._backoff = self._backoff / 2 if self._backoff > 0.1 else 0.0
+            break
+        
+        return response
+
+    def _normalize_url(self, src: str) -> str:
+        """Абсолютный URL из src/href карточки без разбора базового URL (urljoin)"""
+        if src[:1] == '/':
+            return 'https:' + src if src[1:2] == '/' else self._base_prefix + src
+        return src
+
+    def _sku_from_url(self, url: str) -> Optional[str]:
+        """SKU из ссылки на товар: первый сегмент пути из A-Z0-9"""
+        # Типичная ссылка {host}/p/{SKU}/{slug}/ разбирается без regex: до SKU
+        # в ней нет сегментов, которые могли бы совпасть раньше
+        prefix = self._base_prefix + '/p/'
+        if url.startswith(prefix):
+            sku, sep, _ = url[len(prefix):].partition('/')
+            if sep and sku.isascii() and sku.isalnum() and sku == sku.upper():
+                return sku
+        # Остальные (нестандартные) ссылки — прежний regex
+        sku_match = _URL_SKU_RE.search(url)
+        return sku_match.group(1) if sku_match else None
+
     def _extract_price(self, text: str) -> Optional[float]:
         """Улучшенное извлечение цены из текста с учетом структуры Lamoda"""
         if not text:
             return None
-        
-        # Очищаем от HTML тегов и лишних символов
-        text = re.sub(r'<[^>]+>', '', text)
-        text = text.strip()
-        
-        # Убираем валютные символы но сохраняем контекст
-        clean_text = text.replace('₸', '').replace('₽', '').replace('р.', '').strip()
-        
-        # Паттерн для цен с пробелами (стандартный формат Lamoda)
-        # Например: "15 990", "2 350", "125 000"
-        price_pattern = r'\b(\d{1,3}(?:\s+\d{3})*)\b'
-        
-        matches = re.findall(price_pattern, clean_text)
-        
-        if matches:
-            # Берем первое совпадение как основную цену
-            price_str = matches[0].replace(' ', '')
-            try:
-                price = float(price_str)
-                # Проверяем разумность цены (от 100 до 10 млн тенге/рублей)
-                if 100 <= price <= 10000000:
+        return _extract_price_cached(text)
+
+    def _first_price(self, selector: "sv.SoupSieve", element) -> Optional[float]:
+        """Первая валидная цена среди элементов, подходящих под скомпилированный селектор"""
+        for price_elem in selector.select(element):
+            price_text = price_elem.get_text(strip=True)
+            if price_text and self.currency in price_text:
+                price = self._extract_price(price_text)
+                if price:
                     return price
-            except ValueError:
-                pass
-        
-        # Fallback: ищем любые числа без пробелов
-        fallback_pattern = r'\b(\d{3,7})\b'
-        fallback_matches = re.findall(fallback_pattern, clean_text)
-        
-        if fallback_matches:
-            for match in fallback_matches:
-                try:
-                    price = float(match)
-                    if 100 <= price <= 10000000:
-                        return price
-                except ValueError:
-                    continue
-        
         return None
 
     def _extract_prices_from_element(self, element) -> Optional[Dict[str, Optional[float]]]:
@@ -157,73 +538,37 @@ class LamodaParser:
                 'old_price': None
             }
             
-            # Современные селекторы на основе реальной структуры Lamoda
-            price_selectors = {
-                'new_price': [
-                    '.x-product-card-description__price-new',
-                    'span[class*="price-new"]', 
-                    'span[class*="price_new"]',
-                    '.product-card__price_new'
-                ],
-                'old_price': [
-                    '.x-product-card-description__price-old',
-                    '.x-product-card-description__price-second-old',
-                    'span[class*="price-old"]',
-                    'span[class*="price_old"]',
-                    '.product-card__price_old'
-                ],
-                'single_price': [
-                    '.x-product-card-description__price-single',
-                    'span[class*="price-single"]',
-                    'span[class*="price_single"]',
-                    '.product-card__price:not([class*="old"]):not([class*="new"])'
-                ]
-            }
-            
             # Извлекаем новую (актуальную) цену
-            for selector in price_selectors['new_price']:
-                price_elem = element.select_one(selector)
-                if price_elem:
-                    price_text = price_elem.get_text(strip=True)
-                    if price_text and ('₸' in price_text or '₽' in price_text or 'р.' in price_text):
-                        price = self._extract_price(price_text)
-                        if price:
-                            price_info['current_price'] = price
-                            break
+            price = self._first_price(_SEL_NEW_PRICE, element)
+            if price:
+                price_info['current_price'] = price
             
             # Извлекаем старую цену  
-            for selector in price_selectors['old_price']:
-                old_price_elem = element.select_one(selector)
-                if old_price_elem:
-                    old_price_text = old_price_elem.get_text(strip=True)
-                    if old_price_text and ('₸' in old_price_text or '₽' in old_price_text or 'р.' in old_price_text):
-                        old_price = self._extract_price(old_price_text)
-                        if old_price:
-                            price_info['old_price'] = old_price
-                            break
+            old_price = self._first_price(_SEL_OLD_PRICE, element)
+            if old_price:
+                price_info['old_price'] = old_price
             
             # Если актуальной цены нет, ищем единственную цену
             if not price_info['current_price']:
-                for selector in price_selectors['single_price']:
-                    price_elem = element.select_one(selector)
-                    if price_elem:
-                        price_text = price_elem.get_text(strip=True)
-                        if price_text and ('₸' in price_text or '₽' in price_text or 'р.' in price_text):
-                            price = self._extract_price(price_text)
-                            if price:
-                                price_info['current_price'] = price
-                                break
+                price = self._first_price(_SEL_SINGLE_PRICE, element)
+                if price:
+                    price_info['current_price'] = price
             
             # Fallback: ищем любые элементы с ценами в тексте
             if not price_info['current_price']:
-                element_text = element.get_text()
-                all_price_matches = re.findall(r'(\d{1,3}(?:\s+\d{3})*)\s*[₸₽]', element_text)
+                # Разделитель не дает склеить соседние цены ("15 990" + "12 990") в одно число
+                element_text = element.get_text(' ', strip=True)
+                # Без символа валюты regex заведомо ничего не найдет
+                if self.currency in element_text:
+                    all_price_matches = _ELEMENT_PRICE_RE.findall(element_text)
+                else:
+                    all_price_matches = []
                 
                 if all_price_matches:
                     prices = []
                     for price_str in all_price_matches:
                         try:
-                            price = float(price_str.replace(' ', ''))
+                            price = _normalize_price(price_str)
                             if 100 <= price <= 10000000:
                                 prices.append(price)
                         except ValueError:
@@ -244,7 +589,7 @@ class LamodaParser:
             return price_info if price_info['current_price'] else None
             
         except Exception as e:
-            print(f"❌ Error extracting prices: {e}")
+            logger.warning("❌ Error extracting prices: %s", e)
             return None
 
     async def _try_real_search(self, query: str, limit: int = 20, page: int = 1) -> List[Product]:
@@ -260,104 +605,110 @@ class LamodaParser:
             if page > 1:
                 params['p'] = page
             
-            print(f"Searching: {search_url} with query: {query}")
+            logger.debug("Searching: %s with query: %s", search_url, query)
             
             response = await self._make_request(search_url, params=params)
             if not response:
-                print("Failed to get response")
+                logger.warning("Failed to get response")
                 return []
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Анализируем структуру страницы
-            products = self._parse_lamoda_products(soup, limit)
+            # Разбор страницы — чистый CPU: уводим его в поток, чтобы не блокировать
+            # event loop, пока параллельно грузятся соседние страницы
+            products = await asyncio.to_thread(self._parse_search_page, response.content, limit)
             
             if products:
-                print(f"Successfully parsed {len(products)} products")
+                logger.debug("Successfully parsed %s products", len(products))
                 return products
             else:
-                print("No products found in HTML")
+                logger.debug("No products found in HTML")
                 return []
             
         except Exception as e:
-            print(f"Real search failed: {e}")
+            logger.warning("Real search failed: %s", e)
             return []
 
-    def _parse_lamoda_products(self, soup: BeautifulSoup, limit: int) -> List[Product]:
-        """Парсинг товаров из HTML страницы Lamoda на основе реальной структуры"""
-        products = []
+    def _parse_search_page(self, content: bytes, limit: int) -> List[Product]:
+        """Построить дерево страницы поиска и извлечь из него товары"""
+        # lxml (libxml2) заметно быстрее html.parser; байты — кодировку определяет парсер
+        soup = BeautifulSoup(content, 'lxml', parse_only=PRODUCT_STRAINER)
+        
+        # Анализируем структуру страницы
+        return self._parse_lamoda_products(soup, limit)
+
+    def _parse_lamoda_products(
+        self, soup: BeautifulSoup, limit: int, page_text: Optional[str] = None
+    ) -> List[Product]:
+        """Парсинг товаров из HTML страницы Lamoda на основе реальной структуры
+
+        `page_text` — уже полученный текст страницы, если он есть у вызывающего кода.
+        """
+        # SKU -> Product: дубликаты отбрасываются сразу, порядок сохраняется
+        seen: Dict[str, Product] = {}
         
-        print("🔍 Analyzing page content...")
+        logger.debug("🔍 Analyzing page content...")
         
         # Сначала пытаемся извлечь данные из JSON на странице
-        print("🔍 Trying JSON extraction...")
-        json_products = self._extract_json_from_scripts(soup, limit)
-        if json_products:
-            products.extend(json_products)
-            print(f"✅ Found {len(json_products)} products from JSON")
+        logger.debug("🔍 Trying JSON extraction...")
+        self._extract_json_from_scripts(soup, limit, seen)
+        if seen:
+            logger.debug("✅ Found %s products from JSON", len(seen))
         
         # Если JSON не дал результатов, пробуем HTML парсинг
-        if not products:
+        if not seen:
             product_blocks = self._find_product_blocks(soup)
             
             if product_blocks:
-                print(f"🔍 Found {len(product_blocks)} product blocks in HTML")
+                logger.debug("🔍 Found %s product blocks in HTML", len(product_blocks))
                 
                 for i, block in enumerate(product_blocks[:limit]):
                     # Пытаемся парсить современную карточку
                     product = self._parse_modern_product_card(block, i)
                     if product:
-                        products.append(product)
-                        print(f"✅ Parsed from HTML: {product.brand} - {product.name} - {product.price}₸" + 
-                              (f" (was {product.old_price}₸)" if product.old_price else ""))
+                        seen.setdefault(product.sku, product)
+                        logger.debug("✅ Parsed from HTML: %s - %s - %s₸ (was %s₸)",
+                                     product.brand, product.name, product.price, product.old_price)
                         
-                    if len(products) >= limit:
+                    if len(seen) >= limit:
                         break
         
         # Если всё ещё нет товаров, используем fallback regex парсинг
-        if not products:
-            print("🔍 Fallback to regex text parsing...")
-            products = self._parse_from_regex_fallback(soup, limit)
-        
-        # Удаляем дубликаты (по SKU, а не по бренду и названию)
-        unique_products: list[Product] = []
-        seen_skus: set[str] = set()
-        for prod in products:
-            # Используем SKU как основной критерий уникальности
-            if prod.sku not in seen_skus:
-                seen_skus.add(prod.sku)
-                unique_products.append(prod)
-
-        print(f"📈 Final result after deduplication: {len(unique_products)} products (was {len(products)})")
-        return unique_products[:limit]
-
-    def _parse_from_regex_fallback(self, soup: BeautifulSoup, limit: int) -> List[Product]:
+        if not seen:
+            logger.debug("🔍 Fallback to regex text parsing...")
+            for product in self._parse_from_regex_fallback(soup, limit, page_text=page_text):
+                seen.setdefault(product.sku, product)
+                if len(seen) >= limit:
+                    break
+
+        logger.debug("📈 Final result after deduplication: %s products", len(seen))
+        return list(seen.values())
+
+    def _parse_from_regex_fallback(
+        self, soup: BeautifulSoup, limit: int, page_text: Optional[str] = None
+    ) -> List[Product]:
         """Fallback regex парсинг из текста страницы"""
         products = []
-        page_text = soup.get_text()
+        # Текст всей страницы — многомегабайтная строка: строим только если не передан.
+        # Паттерны рассчитаны на get_text() без разделителя ("22 70017 29013 832 ₸")
+        if page_text is None:
+            page_text = soup.get_text()
         
         # На основе веб-результатов, структура Lamoda такая:
         # "цена₸ старая_цена₸ итоговая_цена ₸ Бренд Название"
         # Пример: "22 70017 29013 832 ₸ PUMA Шорты спортивные ESS 2 COLOR"
         currency_symbol = self.currency
         
-        # Обновленные паттерны на основе реальной структуры
-        price_patterns = [
-            # Основной паттерн: множественные цены + бренд + название
-            rf'(\d{{1,3}}(?:\s+\d{{3}})*)\s*(\d{{1,3}}(?:\s+\d{{3}})*)\s*(\d{{1,3}}(?:\s+\d{{3}})*)\s*{re.escape(currency_symbol)}\s+([A-Z][A-Za-z\s&\.]+?)\s+([\w\s\-а-яё\.,"\'()]+?)(?=\d{{1,3}}(?:\s+\d{{3}})*\s*(?:\d{{1,3}}(?:\s+\d{{3}})*\s*)*{re.escape(currency_symbol)}|$)',
-            # Паттерн с двумя ценами
-            rf'(\d{{1,3}}(?:\s+\d{{3}})*)\s*(\d{{1,3}}(?:\s+\d{{3}})*)\s*{re.escape(currency_symbol)}\s+([A-Z][A-Za-z\s&\.]+?)\s+([\w\s\-а-яё\.,"\'()]+?)(?=\d{{1,3}}(?:\s+\d{{3}})*\s*(?:\d{{1,3}}(?:\s+\d{{3}})*\s*)*{re.escape(currency_symbol)}|$)',
-            # Простой паттерн: цена + бренд + название  
-            rf'(\d{{1,3}}(?:\s+\d{{3}})*)\s*{re.escape(currency_symbol)}\s+([A-Z][A-Za-z\s&\.]+?)\s+([\w\s\-а-яё\.,"\'()]+?)(?=\d{{1,3}}(?:\s+\d{{3}})*\s*{re.escape(currency_symbol)}|$)',
-        ]
+        logger.debug("🔍 Searching for products with currency: %s", currency_symbol)
         
-        print(f"🔍 Searching for products with currency: {currency_symbol}")
+        # Все паттерны требуют символ валюты: дешевая проверка подстроки
+        # избавляет от трех полных regex-проходов по тексту страницы
+        if currency_symbol not in page_text:
+            return products
         
-        for pattern_idx, pattern in enumerate(price_patterns):
-            matches = re.findall(pattern, page_text, re.MULTILINE | re.IGNORECASE)
+        for pattern_idx, pattern in enumerate(self._fallback_patterns):
+            matches = pattern.findall(page_text)
             
             if matches:
-                print(f"✅ Found {len(matches)} matches with pattern {pattern_idx + 1}")
+                logger.debug("✅ Found %s matches with pattern %s", len(matches), pattern_idx + 1)
                 
                 for i, match in enumerate(matches[:limit]):
                     try:
@@ -365,18 +716,18 @@ class LamodaParser:
                         if len(match) == 5:  # Паттерн с 3 ценами
                             price_str_1, price_str_2, price_str_3, brand_raw, name_raw = match
                             # Берем минимальную цену как актуальную
-                            prices = [float(p.replace(' ', '')) for p in [price_str_1, price_str_2, price_str_3]]
+                            prices = [_normalize_price(p) for p in [price_str_1, price_str_2, price_str_3]]
                             price = min(prices)
                             old_price = max(prices) if max(prices) > min(prices) else None
                         elif len(match) == 4:  # Паттерн с 2 ценами
                             price_str_1, price_str_2, brand_raw, name_raw = match
-                            price1 = float(price_str_1.replace(' ', ''))
-                            price2 = float(price_str_2.replace(' ', ''))
+                            price1 = _normalize_price(price_str_1)
+                            price2 = _normalize_price(price_str_2)
                             price = min(price1, price2)
                             old_price = max(price1, price2) if price1 != price2 else None
                         else:  # Простой паттерн с 1 ценой
                             price_str, brand_raw, name_raw = match
-                            price = float(price_str.replace(' ', ''))
+                            price = _normalize_price(price_str)
                             old_price = None
                         
                         # Проверяем разумность цены
@@ -400,7 +751,7 @@ class LamodaParser:
                         continue
                         
                     except Exception as e:
-                        print(f"❌ Error parsing match {i}: {e}")
+                        logger.warning("❌ Error parsing match %s: %s", i, e)
                         continue
                 
                 if products:
@@ -410,26 +761,18 @@ class LamodaParser:
 
     def _clean_brand(self, brand_raw: str) -> str:
         """Очистка названия бренда"""
-        # Известные бренды
-        known_brands = [
-            'Nike', 'Adidas', 'Puma', 'Reebok', 'Jordan', 'Converse', 'New Balance', 
-            'Vans', 'Under Armour', 'Asics', 'Mizuno', 'Skechers', 'Fila', 'Kappa', 
-            'Umbro', 'Diadora', 'Calvin Klein', 'Tommy Hilfiger', 'Lacoste', 'Hugo Boss',
-            'Demix', 'Outventure', 'Baon', 'Befree', 'Mango', 'Zara', 'H&M', 'Uniqlo',
-            'Euphoria', 'Profit', 'Terranova', 'Pepe Jeans', 'Marco Tozzi', 'Tamaris',
-            'Founds', 'Nume', 'Shoiberg', 'T.Taccardi', 'Abricot', 'Pierre Cardin'
-        ]
+        brand_words = brand_raw.split()
         
         # Ищем точное совпадение
-        brand_words = brand_raw.split()
         for word in brand_words:
-            for known_brand in known_brands:
-                if word.lower() == known_brand.lower():
-                    return known_brand
+            hit = _KNOWN_BRANDS_LOWER.get(word.lower())
+            if hit:
+                return hit
         
         # Ищем частичное совпадение
-        for known_brand in known_brands:
-            if known_brand.lower() in brand_raw.lower():
+        brand_lower = brand_raw.lower()
+        for known_lower, known_brand in _KNOWN_BRANDS_LOWER.items():
+            if known_lower in brand_lower:
                 return known_brand
         
         # Возвращаем первое слово как бренд
@@ -439,8 +782,8 @@ class LamodaParser:
     def _clean_name(self, name_raw: str) -> str:
         """Очистка названия товара"""
         # Удаляем лишние символы и числа в конце
-        name = re.sub(r'\s+\d+\s*$', '', name_raw)  # Убираем числа в конце
-        name = re.sub(r'\s{2,}', ' ', name)  # Убираем множественные пробелы
+        name = _TRAIL_NUM_RE.sub('', name_raw)  # Убираем числа в конце
+        name = _MULTI_WS_RE.sub(' ', name)  # Убираем множественные пробелы
         name = name.strip()
         
         # Ограничиваем длину
@@ -458,60 +801,69 @@ class LamodaParser:
             brand_lower = brand.lower()
             # Ограничимся первыми несколькими словами названия для поиска в alt
             name_tokens = [t.lower() for t in name.split()[:3]]
+            # Бренд и токены названия — одна регулярка: alt проверяется за один проход
+            needles = ([brand_lower] if brand_lower else []) + name_tokens
+            alt_matcher = re.compile('|'.join(map(re.escape, needles))).search if needles else None
 
-            img_tags = soup.find_all('img')
+            # dict сохраняет порядок и дает O(1) проверку на дубликаты
+            candidate_urls: Dict[str, None] = {}  # Изображения, которые совпали по alt/brand/name
+            fallback_urls: Dict[str, None] = {}   # Все подходящие изображения (на случай отсутствия совпадений)
 
-            candidate_urls: list[str] = []  # Изображения, которые совпали по alt/brand/name
-            fallback_urls: list[str] = []   # Все подходящие изображения (на случай отсутствия совпадений)
-
-            for img in img_tags:
-                src = img.get('src') or img.get('data-src') or img.get('data-original')
-                if not src:
+            for img in soup.find_all('img'):
+                attrs = img.attrs
+                src = attrs.get('src') or attrs.get('data-src') or attrs.get('data-original')
+                # Нормализация URL не добавляет lmcdn.ru, поэтому отсекаем чужие картинки сразу
+                if not src or 'lmcdn.ru' not in src:
                     continue
 
-                # Нормализуем URL
-                if src.startswith('//'):
-                    full_url = 'https:' + src
-                elif src.startswith('/'):
-                    full_url = urljoin(self.base_url, src)
-                else:
-                    full_url = src
-
-                if not full_url or 'lmcdn.ru' not in full_url:
+                src_lower = src.lower()
+                if not any(ext in src_lower for ext in _IMAGE_EXTENSIONS):
                     continue
 
-                if not any(ext in full_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                    continue
+                # Нормализуем URL
+                full_url = self._normalize_url(src)
 
                 # Проверяем alt-текст, чтобы понять принадлежит ли изображение бренду/товару
-                alt_text = (img.get('alt') or '').lower()
+                alt_text = (attrs.get('alt') or '').lower()
 
-                matches_brand = brand_lower in alt_text if brand_lower else False
-                matches_name = any(tok in alt_text for tok in name_tokens) if name_tokens else False
-
-                if (matches_brand or matches_name) and full_url not in candidate_urls:
-                    candidate_urls.append(full_url)
-                elif full_url not in fallback_urls:
-                    fallback_urls.append(full_url)
+                if alt_matcher and alt_matcher(alt_text):
+                    candidate_urls.setdefault(full_url)
+                else:
+                    fallback_urls.setdefault(full_url)
 
             # Если нашли совпадения по alt/brand/name – используем их, иначе fallback
-            final_urls = candidate_urls if candidate_urls else fallback_urls
+            final_urls = list(candidate_urls or fallback_urls)
 
             if final_urls:
                 image_url = final_urls[0]
                 image_urls.extend(final_urls)
         
         except Exception as e:
-            print(f"❌ Error finding images: {e}")
+            logger.warning("❌ Error finding images: %s", e)
         
         return image_url, image_urls
 
-    def _extract_json_from_scripts(self, soup: BeautifulSoup, limit: int) -> List[Product]:
-        """Извлечение товаров из JSON данных в скриптах страницы"""
-        products = []
+    def _extract_json_from_scripts(
+        self, soup: BeautifulSoup, limit: int, seen: Optional[Dict[str, Product]] = None
+    ) -> List[Product]:
+        """Извлечение товаров из JSON данных в скриптах страницы
+
+        Товары складываются в `seen` (SKU -> Product) без дубликатов; поиск
+        прекращается, как только набрано `limit` уникальных товаров.
+        """
+        if seen is None:
+            seen = {}
 
-        def _find_products_array(text: str) -> Optional[str]:
-            """Найти и вернуть JSON-строку массива products с балансировкой скобок"""
+        def _collect(extracted: List[Product]) -> bool:
+            """Добавить товары в seen; True — лимит набран"""
+            for product in extracted:
+                seen.setdefault(product.sku, product)
+                if len(seen) >= limit:
+                    return True
+            return False
+
+        def _find_products_array(text: str) -> Optional[list]:
+            """Найти и разобрать JSON-массив products, следующий за ключом"""
             key = '"products"'
             start_key = text.find(key)
             if start_key == -1:
@@ -520,16 +872,10 @@ class LamodaParser:
             array_start = text.find('[', start_key)
             if array_start == -1:
                 return None
-            depth = 0
-            for idx in range(array_start, len(text)):
-                ch = text[idx]
-                if ch == '[':
-                    depth += 1
-                elif ch == ']':
-                    depth -= 1
-                    if depth == 0:
-                        return text[array_start:idx + 1]
-            return None
+            # raw_decode разбирает ровно один JSON-массив и сам находит его конец (в C),
+            # без посимвольной балансировки скобок в Python
+            data, _end = _JSON_DECODER.raw_decode(text, array_start)
+            return data
         
         try:
             # Ищем различные паттерны со встроенными JSON данными
@@ -543,68 +889,48 @@ class LamodaParser:
 
                 # 1) Попытка найти products через helper (поддержка __NUXT__)
                 if '"products"' in script_content:
-                    products_json_str = _find_products_array(script_content)
-                    if products_json_str:
-                        try:
-                            products_data = json.loads(products_json_str)
+                    try:
+                        products_data = _find_products_array(script_content)
+                        if products_data:
                             extracted = self._extract_products_from_lamoda_json(products_data, limit)
-                            if extracted:
-                                products.extend(extracted)
-                                if len(products) >= limit:
-                                    return products[:limit]
-                        except json.JSONDecodeError as e:
-                            print(f"❌ JSON decode error (products array): {e}")
-                            # fallthrough to regex strategies
+                            if _collect(extracted):
+                                return list(seen.values())
+                    except json.JSONDecodeError as e:
+                        logger.warning("❌ JSON decode error (products array): %s", e)
+                        # fallthrough to regex strategies
                 
-                # Паттерны для поиска JSON с товарами (старые методы)
-                json_patterns = [
-                    # Основной паттерн для Lamoda
-                    r'"products"\s*:\s*(\[[\s\S]*?\])',
-                    r'window\.__INITIAL_STATE__\s*=\s*({[\s\S]*?});',
-                    r'window\.dataLayer\s*=\s*(\[[\s\S]*?\]);',
-                    r'window\.__NEXT_DATA__\s*=\s*({[\s\S]*?});',
-                    # Дополнительные паттерны
-                    r'catalogsearch.*?"products"\s*:\s*(\[[\s\S]*?\])',
-                    r'"catalog"\s*:\s*{[\s\S]*?"items"\s*:\s*(\[[\s\S]*?\])',
-                ]
-                
-                for pattern in json_patterns:
-                    matches = re.findall(pattern, script_content, re.DOTALL)
+                for literal, pattern in _JSON_PATTERNS:
+                    if literal not in script_content:
+                        continue
+                    matches = pattern.findall(script_content)
                     
                     for match in matches:
                         try:
                             # Если это массив товаров
                             if match.strip().startswith('['):
-                                products_data = json.loads(match)
-                                extracted = self._extract_products_from_lamoda_json(products_data, limit - len(products))
-                                if extracted:
-                                    products.extend(extracted)
-                                    if len(products) >= limit:
-                                        return products[:limit]
+                                products_data = _loads(match)
+                                extracted = self._extract_products_from_lamoda_json(products_data, limit - len(seen))
+                                if _collect(extracted):
+                                    return list(seen.values())
                                     
                             # Если это объект с товарами
                             else:
-                                data = json.loads(match)
-                                extracted = self._find_products_in_object(data, limit - len(products))
-                                if extracted:
-                                    products.extend(extracted)
-                                    if len(products) >= limit:
-                                        return products[:limit]
+                                data = _loads(match)
+                                extracted = self._find_products_in_object(data, limit - len(seen))
+                                if _collect(extracted):
+                                    return list(seen.values())
                                 
-                        except json.JSONDecodeError as e:
-                            print(f"❌ JSON decode error: {e}")
+                        except orjson.JSONDecodeError as e:
+                            logger.warning("❌ JSON decode error: %s", e)
                             continue
                         except Exception as e:
-                            print(f"❌ Error processing JSON: {e}")
+                            logger.warning("❌ Error processing JSON: %s", e)
                             continue
-                
-                if len(products) >= limit:
-                    break
         
         except Exception as e:
-            print(f"❌ Error extracting JSON from scripts: {e}")
+            logger.warning("❌ Error extracting JSON from scripts: %s", e)
         
-        return products[:limit]
+        return list(seen.values())
 
     def _extract_products_from_lamoda_json(self, products_data: list, limit: int) -> List[Product]:
         """Извлечение товаров из JSON массива Lamoda"""
@@ -616,7 +942,7 @@ class LamodaParser:
                 if product:
                     products.append(product)
             except Exception as e:
-                print(f"❌ Error parsing product JSON: {e}")
+                logger.warning("❌ Error parsing product JSON: %s", e)
                 continue
         
         return products
@@ -685,12 +1011,13 @@ class LamodaParser:
             
             # Если URL не найден, пропускаем товар
             if not url:
-                print(f"⚠️ Skipping product {sku} - no URL found")
+                logger.warning("⚠️ Skipping product %s - no URL found", sku)
                 return None
             
             # Изображения
             image_url = ""
             image_urls = []
+            image_urls_seen = set()  # те же URL для O(1) проверки дубликатов
             
             # Основное изображение
             thumbnail = item.get('thumbnail', '')
@@ -701,6 +1028,7 @@ class LamodaParser:
                     image_url_raw = thumbnail
                 image_url = image_url_raw
                 image_urls.append(image_url)
+                image_urls_seen.add(image_url)
             
             # Дополнительные изображения из галереи
             gallery = item.get('gallery', [])
@@ -708,7 +1036,8 @@ class LamodaParser:
                 for img_path in gallery:
                     if img_path and img_path.startswith('/'):
                         full_img_url = f"https://a.lmcdn.ru{img_path}"
-                        if full_img_url not in image_urls:
+                        if full_img_url not in image_urls_seen:
+                            image_urls_seen.add(full_img_url)
                             image_urls.append(full_img_url)
             
             # Проверяем минимальные требования
@@ -726,76 +1055,50 @@ class LamodaParser:
                 old_price=old_price,
                 url=url,
                 image_url=image_url,
-                image_urls=image_urls
+                image_urls=tuple(image_urls)
             )
             
         except Exception as e:
-            print(f"❌ Error parsing Lamoda product JSON: {e}")
+            logger.warning("❌ Error parsing Lamoda product JSON: %s", e)
             return None
 
     def _find_products_in_object(self, data: dict, limit: int) -> List[Product]:
-        """Рекурсивный поиск товаров в JSON объекте"""
+        """Поиск товаров в JSON объекте (обход в глубину на явном стеке)"""
         products = []
+        stack = [data]
         
-        def search_recursive(obj, path=""):
-            nonlocal products
+        while stack and len(products) < limit:
+            obj = stack.pop()
+            # JSON-декодер отдает только точные dict/list/str/int/float/bool/None,
+            # поэтому сравнение типа дешевле isinstance; примитивы сразу пропускаем
+            obj_type = type(obj)
             
-            if len(products) >= limit:
-                return
-                
-            if isinstance(obj, dict):
+            if obj_type is dict:
                 # Ищем ключи которые могут содержать товары
-                product_keys = ['products', 'items', 'catalog', 'results', 'data']
-                for key in product_keys:
-                    if key in obj and isinstance(obj[key], list):
-                        extracted = self._extract_products_from_lamoda_json(obj[key], limit - len(products))
-                        products.extend(extracted)
+                for key in _PRODUCT_KEYS:
+                    value = obj.get(key)
+                    if isinstance(value, list):
+                        products.extend(self._extract_products_from_lamoda_json(value, limit - len(products)))
                         if len(products) >= limit:
-                            return
-                
-                # Рекурсивно проверяем другие ключи
-                for key, value in obj.items():
-                    if key not in product_keys and len(products) < limit:
-                        search_recursive(value, f"{path}.{key}")
-                        
-            elif isinstance(obj, list):
-                for i, item in enumerate(obj):
-                    if len(products) >= limit:
-                        break
-                    search_recursive(item, f"{path}[{i}]")
+                            break
+                else:
+                    # Остальные ключи обходим в исходном порядке
+                    stack.extend(reversed([
+                        value for key, value in obj.items() if key not in _PRODUCT_KEY_SET
+                    ]))
+                    
+            elif obj_type is list:
+                stack.extend(reversed(obj))
         
-        search_recursive(data)
         return products
 
     def _find_product_blocks(self, soup: BeautifulSoup) -> List:
         """Найти блоки товаров в HTML"""
         # Попробуем различные селекторы, начиная с наиболее специфичных
-        selectors = [
-            # Селекторы для современного Lamoda
-            'a[href*="/p/"]',  # Прямые ссылки на товары
-            'div[class*="product"] a[href]',  # Ссылки внутри блоков товаров
-            'article a[href]',  # Ссылки в article элементах
-            '.product-card a[href]',  # Старые селекторы
-            '.product-card',
-            '.product-item',
-            '.catalog-item',
-            '.item-card',
-            # Селекторы на основе классов
-            '[class*="product"]',
-            '[class*="item"]',
-            '[class*="card"]',
-            # Структурные селекторы
-            'article',
-            '.grid-item',
-            'li[class*="item"]',
-            # Fallback селекторы
-            'div[data-*]',
-        ]
-        
-        for selector in selectors:
-            blocks = soup.select(selector)
+        for selector, compiled in _SEL_PRODUCT_BLOCKS:
+            blocks = compiled.select(soup)
             if blocks and len(blocks) > 3:  # Должно быть хотя бы несколько товаров
-                print(f"Found product blocks with selector: {selector}")
+                logger.debug("Found product blocks with selector: %s", selector)
                 return blocks
         
         return []
@@ -815,18 +1118,8 @@ class LamodaParser:
             }
             
             # Стратегия 1: Извлечение названия
-            name_selectors = [
-                'h3[class*="title"]',
-                'div[class*="title"]',
-                'span[class*="title"]',
-                '[data-testid*="title"]',
-                '[data-testid*="name"]',
-                'h1, h2, h3, h4',
-                '.product-card__product-name',  # Старый селектор
-            ]
-            
-            for selector in name_selectors:
-                name_elem = element.select_one(selector)
+            for selector in _SEL_NAMES:
+                name_elem = selector.select_one(element)
                 if name_elem:
                     name_text = name_elem.get_text(strip=True)
                     if name_text and len(name_text) > 3 and name_text != "Product":
@@ -834,15 +1127,8 @@ class LamodaParser:
                         break
             
             # Стратегия 2: Извлечение бренда
-            brand_selectors = [
-                'span[class*="brand"]',
-                'div[class*="brand"]',
-                '[data-testid*="brand"]',
-                '.product-card__brand-name',  # Старый селектор
-            ]
-            
-            for selector in brand_selectors:
-                brand_elem = element.select_one(selector)
+            for selector in _SEL_BRANDS:
+                brand_elem = selector.select_one(element)
                 if brand_elem:
                     brand_text = brand_elem.get_text(strip=True)
                     if brand_text and len(brand_text) > 1 and brand_text != "Unknown":
@@ -851,16 +1137,9 @@ class LamodaParser:
             
             # Если бренд не найден, пытаемся извлечь из названия
             if not product_data['brand'] and product_data['name']:
-                known_brands = ['Nike', 'Adidas', 'Puma', 'Reebok', 'Jordan', 'Converse', 
-                               'New Balance', 'Vans', 'Under Armour', 'Asics', 'Mizuno',
-                               'Skechers', 'Fila', 'Kappa', 'Umbro', 'Diadora', 'Calvin Klein',
-                               'Tommy Hilfiger', 'Lacoste', 'Polo Ralph Lauren', 'Hugo Boss']
-                
-                name_upper = product_data['name'].upper()
-                for brand in known_brands:
-                    if brand.upper() in name_upper:
-                        product_data['brand'] = brand
-                        break
+                brand_match = _BRAND_RE.search(product_data['name'])
+                if brand_match:
+                    product_data['brand'] = _KNOWN_BRANDS_LOWER[brand_match.group().lower()]
             
             # Стратегия 3: Извлечение цены с улучшенными селекторами
             price_info = self._extract_prices_from_element(element)
@@ -869,24 +1148,16 @@ class LamodaParser:
                 product_data['old_price'] = price_info['old_price']
             
             # Стратегия 4: Извлечение URL
-            # Улучшенная логика поиска ссылки
-            url_selectors = [
-                'a[href*="/p/"]',  # Прямые ссылки на товары
-                'a[href]',  # Любые ссылки
-            ]
-            
+            # Берем только прямую ссылку на товар: любая другая ссылка без "/p/"
+            # все равно отбрасывалась бы проверкой ниже
             found_url = None
-            for selector in url_selectors:
-                link_elem = element.select_one(selector)
-                if link_elem and link_elem.get('href'):
-                    href = link_elem['href']
-                    # Проверяем что это реальная ссылка на товар
-                    if href.startswith('/p/') or '/p/' in href:
-                        if href.startswith('/'):
-                            found_url = urljoin(self.base_url, href)
-                        elif href.startswith('http'):
-                            found_url = href
-                        break
+            link_elem = _SEL_PRODUCT_LINK.select_one(element)
+            if link_elem:
+                href = link_elem['href']
+                if href.startswith('/'):
+                    found_url = self._normalize_url(href)
+                elif href.startswith('http'):
+                    found_url = href
             
             # Если не нашли ссылку в элементе, ищем в родительских элементах
             if not found_url:
@@ -898,7 +1169,7 @@ class LamodaParser:
                             href = parent_link['href']
                             if href.startswith('/p/') or '/p/' in href:
                                 if href.startswith('/'):
-                                    found_url = urljoin(self.base_url, href)
+                                    found_url = self._normalize_url(href)
                                 elif href.startswith('http'):
                                     found_url = href
                                 break
@@ -909,37 +1180,29 @@ class LamodaParser:
             product_data['url'] = found_url
             
             # Стратегия 5: Извлечение изображений
-            img_selectors = [
-                'img[src*="lmcdn"]',
-                'img[data-src*="lmcdn"]',
-                'img[class*="image"]',
-                'img[class*="picture"]',
-                'img',
-            ]
-            
-            found_images = set()
-            for selector in img_selectors:
-                img_elems = element.select(selector)
-                for img in img_elems:
-                    src = (img.get('src') or img.get('data-src') or 
-                          img.get('data-lazy-src') or img.get('data-original'))
-                    if src:
-                        # Нормализуем URL
-                        if src.startswith('//'):
-                            full_url = 'https:' + src
-                        elif src.startswith('/'):
-                            full_url = urljoin(self.base_url, src)
-                        else:
-                            full_url = src
-                        
-                        # Проверяем что это изображение товара
-                        if (full_url and 
-                            ('lmcdn.ru' in full_url or 'lamoda' in full_url) and
-                            any(ext in full_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']) and
-                            full_url not in found_images):
-                            found_images.add(full_url)
-            
-            product_data['image_urls'] = list(found_images)
+            # Все прежние img-селекторы были подмножествами 'img', а результат
+            # собирается в множество — достаточно одного обхода
+            # Дубликаты отсекаем по пути (хост CDN у всех одинаковый), порядок сохраняем
+            found_images: List[str] = []
+            seen_paths = set()
+            for img in _iter_images(element):
+                attrs = img.attrs
+                src = (attrs.get('src') or attrs.get('data-src') or 
+                      attrs.get('data-lazy-src') or attrs.get('data-original'))
+                if src:
+                    # Нормализуем URL
+                    full_url = self._normalize_url(src)
+                    
+                    # Проверяем что это изображение товара
+                    if full_url and _is_product_image_url(full_url):
+                        path = _image_key(full_url)
+                        if path not in seen_paths:
+                            seen_paths.add(path)
+                            found_images.append(full_url)
+                            if len(found_images) >= _MAX_CARD_IMAGES:
+                                break
+            
+            product_data['image_urls'] = found_images
             if product_data['image_urls']:
                 product_data['image_url'] = product_data['image_urls'][0]
             
@@ -947,7 +1210,7 @@ class LamodaParser:
             sku = f"LMD{self.domain.upper()}{index + 1:04d}"
             if product_data['url']:
                 # Пытаемся извлечь SKU из URL
-                sku_match = re.search(r'/([A-Z0-9]+)/?(?:\?|$)', product_data['url'])
+                sku_match = _URL_SKU_END_RE.search(product_data['url'])
                 if sku_match:
                     sku = sku_match.group(1)
             
@@ -971,11 +1234,11 @@ class LamodaParser:
                 old_price=product_data['old_price'],
                 url=product_data['url'],
                 image_url=product_data['image_url'],
-                image_urls=product_data['image_urls']
+                image_urls=tuple(product_data['image_urls'])
             )
             
         except Exception as e:
-            print(f"❌ Error in modern parser for element {index}: {e}")
+            logger.warning("❌ Error in modern parser for element %s: %s", index, e)
             return None
 
     def _parse_legacy_product_card(self, card, index: int) -> Optional[Product]:
@@ -990,99 +1253,83 @@ class LamodaParser:
         """Парсинг отдельной карточки товара с новой структурой"""
         try:
             # Извлекаем бренд
-            brand_elem = card.select_one('.product-card__brand-name')
+            brand_elem = _SEL_CARD_BRAND.select_one(card)
             brand = brand_elem.get_text(strip=True) if brand_elem else "Unknown"
             
             # Извлекаем название товара
-            name_elem = card.select_one('.product-card__product-name')
+            name_elem = _SEL_CARD_NAME.select_one(card)
             name = name_elem.get_text(strip=True) if name_elem else "Product"
             
             # Извлекаем цены с улучшенной логикой
             price_info = self._extract_prices_from_element(card)
             
             if not price_info or not price_info['current_price']:
-                print(f"No price found for product {index}")
+                logger.debug("No price found for product %s", index)
                 return None
             
             price = price_info['current_price']
             old_price = price_info['old_price']
             
+            # Проверяем разумность цены до разбора ссылок и галереи
+            if price > 1000000:
+                logger.debug("Price too high for product %s: %s", index, price)
+                return None
+            
             # Извлекаем ссылку - улучшенная логика
             url = ""
-            url_selectors = [
-                '.product-card__hit-area[href]',
-                'a[href*="/p/"]',
-                'a[href]'
-            ]
-            
-            for selector in url_selectors:
-                link_elem = card.select_one(selector)
+            for selector in _SEL_CARD_LINKS:
+                link_elem = selector.select_one(card)
                 if link_elem and link_elem.get('href'):
                     href = link_elem['href']
                     # Проверяем что это реальная ссылка на товар
                     if href.startswith('/p/') or '/p/' in href or (href.startswith('/') and len(href) > 5):
                         if href.startswith('/'):
-                            url = urljoin(self.base_url, href)
+                            url = self._normalize_url(href)
                         elif href.startswith('http'):
                             url = href
                         break
             
+            if not url:
+                logger.debug("No valid URL found for product %s", index)
+                return None
+            
             # Извлекаем изображения
             image_url = ""
             image_urls = []
+            seen_paths = set()  # пути уже добавленных изображений
             
             # Ищем основное изображение
-            img_elem = card.select_one('.product-card__pic-img')
+            img_elem = _SEL_CARD_PIC.select_one(card)
             if img_elem:
-                src = img_elem.get('src') or img_elem.get('data-src') or img_elem.get('data-lazy-src')
+                attrs = img_elem.attrs
+                src = attrs.get('src') or attrs.get('data-src') or attrs.get('data-lazy-src')
                 if src:
-                    if src.startswith('//'):
-                        image_url = 'https:' + src
-                    elif src.startswith('/'):
-                        image_url = urljoin(self.base_url, src)
-                    else:
-                        image_url = src
+                    image_url = self._normalize_url(src)
                     
                     # Добавляем основное изображение в список
                     if image_url:
                         image_urls.append(image_url)
+                        seen_paths.add(_image_key(image_url))
             
             # Ищем дополнительные изображения
-            all_imgs = card.select('img')
-            for img in all_imgs:
-                src = img.get('src') or img.get('data-src') or img.get('data-lazy-src') or img.get('data-original')
+            for img in _iter_images(card):
+                attrs = img.attrs
+                src = attrs.get('src') or attrs.get('data-src') or attrs.get('data-lazy-src') or attrs.get('data-original')
                 if src:
                     # Нормализуем URL
-                    if src.startswith('//'):
-                        full_url = 'https:' + src
-                    elif src.startswith('/'):
-                        full_url = urljoin(self.base_url, src)
-                    else:
-                        full_url = src
+                    full_url = self._normalize_url(src)
                     
                     # Добавляем только если это изображение товара и его еще нет в списке
-                    if (full_url and 
-                        full_url not in image_urls and 
-                        ('lmcdn.ru' in full_url or 'lamoda' in full_url) and
-                        any(ext in full_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp'])):
-                        image_urls.append(full_url)
-            
-            # Генерируем SKU
-            sku = f"LMD{self.domain.upper()}{index + 1:04d}"
-            if url:
-                # Пробуем извлечь SKU из URL
-                sku_match = re.search(r'/([A-Z0-9]+)/', url)
-                if sku_match:
-                    sku = sku_match.group(1)
+                    if full_url and _is_product_image_url(full_url):
+                        path = _image_key(full_url)
+                        if path not in seen_paths:
+                            seen_paths.add(path)
+                            image_urls.append(full_url)
+                            if len(image_urls) >= _MAX_CARD_IMAGES:
+                                break
             
-            # Проверяем разумность цены и наличие URL
-            if price > 1000000:
-                print(f"Price too high for product {index}: {price}")
-                return None
-            
-            if not url:
-                print(f"No valid URL found for product {index}")
-                return None
+            # Генерируем SKU: из URL, иначе по индексу
+            sku = self._sku_from_url(url) or f"LMD{self.domain.upper()}{index + 1:04d}"
             
             return Product(
                 sku=sku,
@@ -1092,11 +1339,11 @@ class LamodaParser:
                 old_price=old_price,
                 url=url,
                 image_url=image_url,
-                image_urls=image_urls
+                image_urls=tuple(image_urls)
             )
             
         except Exception as e:
-            print(f"Error parsing product card {index}: {e}")
+            logger.warning("Error parsing product card %s: %s", index, e)
             return None
 
     def _parse_product_block(self, block, index: int) -> Optional[Product]:
@@ -1105,32 +1352,34 @@ class LamodaParser:
             # Сначала пробуем парсить как карточку товара
             if hasattr(block, 'select_one'):
                 # Проверяем, есть ли специфичные элементы карточки
-                if (block.select_one('.product-card__brand-name') or 
-                    block.select_one('.product-card__product-name') or
-                    block.select_one('.product-card__price')):
+                if _SEL_CARD_MARKERS.select_one(block):
                     return self._parse_product_card(block, index)
             
             # Извлекаем текст из блока
             text = block.get_text(strip=True)
             
             # Улучшенный поиск цен в тексте
-            price_matches = re.findall(r'(\d+(?:\s+\d+)*)\s*₸', text)
+            price_matches = _BLOCK_PRICE_RE.findall(text)
             if not price_matches:
                 # Попробуем найти цены без валютного символа
-                price_matches = re.findall(r'(\d+(?:\s+\d+){1,2})', text)
+                price_matches = _BLOCK_PRICE_NO_CURRENCY_RE.findall(text)
             
             if not price_matches:
                 return None
             
             # Берем первую найденную цену (обычно это актуальная цена)
             price_str = price_matches[0]
-            price = float(price_str.replace(' ', ''))
+            price = _normalize_price(price_str)
+            
+            # Проверяем разумность цены до остального разбора блока
+            if price > 1000000:
+                return None
             
             # Ищем старую цену (если есть несколько цен)
             old_price = None
             if len(price_matches) > 1:
                 old_price_str = price_matches[1]
-                old_price_val = float(old_price_str.replace(' ', ''))
+                old_price_val = _normalize_price(old_price_str)
                 if old_price_val > price:
                     old_price = old_price_val
             
@@ -1139,78 +1388,59 @@ class LamodaParser:
             
             # Ищем ссылку - улучшенная логика
             url = ""
-            url_selectors = [
-                'a[href*="/p/"]',
-                'a[href]'
-            ]
-            
-            for selector in url_selectors:
-                link = block.select_one(selector)
+            for selector in _SEL_BLOCK_LINKS:
+                link = selector.select_one(block)
                 if link and link.get('href'):
                     href = link['href']
                     # Проверяем что это реальная ссылка на товар
                     if href.startswith('/p/') or '/p/' in href or (href.startswith('/') and len(href) > 5):
                         if href.startswith('/'):
-                            url = urljoin(self.base_url, href)
+                            url = self._normalize_url(href)
                         elif href.startswith('http'):
                             url = href
                         break
             
+            if not url:
+                logger.debug("No valid URL found for product block %s", index)
+                return None
+            
             # Ищем изображение
             image_url = ""
             image_urls = []
+            seen_paths = set()  # пути уже добавленных изображений
             
             # Ищем основное изображение  
             img = block.find('img')
             if img:
-                src = img.get('src') or img.get('data-src') or img.get('data-lazy-src') or img.get('data-original')
+                attrs = img.attrs
+                src = attrs.get('src') or attrs.get('data-src') or attrs.get('data-lazy-src') or attrs.get('data-original')
                 if src:
-                    if src.startswith('//'):
-                        image_url = 'https:' + src
-                    elif src.startswith('/'):
-                        image_url = urljoin(self.base_url, src)
-                    else:
-                        image_url = src
+                    image_url = self._normalize_url(src)
                     
                     # Добавляем основное изображение в список
                     if image_url:
                         image_urls.append(image_url)
+                        seen_paths.add(_image_key(image_url))
             
             # Ищем дополнительные изображения
-            all_imgs = block.find_all('img')
-            for img in all_imgs:
-                src = img.get('src') or img.get('data-src') or img.get('data-lazy-src') or img.get('data-original')
+            for img in _iter_images(block):
+                attrs = img.attrs
+                src = attrs.get('src') or attrs.get('data-src') or attrs.get('data-lazy-src') or attrs.get('data-original')
                 if src:
                     # Нормализуем URL
-                    if src.startswith('//'):
-                        full_url = 'https:' + src
-                    elif src.startswith('/'):
-                        full_url = urljoin(self.base_url, src)
-                    else:
-                        full_url = src
+                    full_url = self._normalize_url(src)
                     
                     # Добавляем только если это изображение товара и его еще нет в списке
-                    if (full_url and 
-                        full_url not in image_urls and 
-                        ('lmcdn.ru' in full_url or 'lamoda' in full_url) and
-                        any(ext in full_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp'])):
-                        image_urls.append(full_url)
+                    if full_url and _is_product_image_url(full_url):
+                        path = _image_key(full_url)
+                        if path not in seen_paths:
+                            seen_paths.add(path)
+                            image_urls.append(full_url)
+                            if len(image_urls) >= _MAX_CARD_IMAGES:
+                                break
             
             # Генерируем SKU из ссылки или используем индекс
-            sku = f"LMD{self.domain.upper()}{index + 1:04d}"
-            if url:
-                # Пробуем извлечь SKU из URL
-                sku_match = re.search(r'/([A-Z0-9]+)/', url)
-                if sku_match:
-                    sku = sku_match.group(1)
-            
-            # Проверяем разумность цены и наличие URL
-            if price > 1000000:
-                return None
-            
-            if not url:
-                print(f"No valid URL found for product block {index}")
-                return None
+            sku = self._sku_from_url(url) or f"LMD{self.domain.upper()}{index + 1:04d}"
             
             return Product(
                 sku=sku,
@@ -1220,137 +1450,77 @@ class LamodaParser:
                 old_price=old_price,
                 url=url,
                 image_url=image_url,
-                image_urls=image_urls
+                image_urls=tuple(image_urls)
             )
             
         except Exception as e:
-            print(f"Error parsing product block {index}: {e}")
+            logger.warning("Error parsing product block %s: %s", index, e)
             return None
 
-    def _extract_brand_and_name(self, text: str) -> tuple[str, str]:
+    def _extract_brand_and_name(self, text: str) -> Tuple[str, str]:
         """Извлечь бренд и название из текста"""
-        # Очищаем текст от лишних символов
-        text = re.sub(r'[₸₽]', '', text)
-        text = re.sub(r'\d+(?:\s+\d+)*', '', text)  # Убираем цены
-        text = ' '.join(text.split())  # Нормализуем пробелы
-        
-        brand = "Unknown"
-        name = "Product"
-        
-        # Известные бренды
-        known_brands = [
-            'Nike', 'Adidas', 'Puma', 'Reebok', 'Jordan', 'Converse', 
-            'New Balance', 'Vans', 'Under Armour', 'Asics', 'Mizuno',
-            'Skechers', 'Fila', 'Kappa', 'Umbro', 'Diadora'
-        ]
-        
-        # Ищем бренд в тексте
-        text_lower = text.lower()
-        for brand_name in known_brands:
-            if brand_name.lower() in text_lower:
-                brand = brand_name
-                # Находим позицию бренда и берем текст после него как название
-                brand_pos = text_lower.find(brand_name.lower())
-                if brand_pos != -1:
-                    name_part = text[brand_pos + len(brand_name):].strip()
-                    if name_part:
-                        # Берем первые несколько слов как название
-                        name_words = name_part.split()[:5]
-                        if name_words:
-                            name = ' '.join(name_words)
-                break
-        
-        # Если бренд не найден, пробуем извлечь из начала текста
-        if brand == "Unknown":
-            words = text.split()
-            if words:
-                # Первое слово может быть брендом
-                first_word = words[0]
-                if len(first_word) > 2 and first_word.isalpha():
-                    brand = first_word
-                    if len(words) > 1:
-                        name = ' '.join(words[1:6])  # Берем следующие 5 слов
-        
-        # Очищаем название от лишних символов
-        name = re.sub(r'[^\w\s\-]', '', name).strip()
-        if not name or len(name) < 3:
-            name = "Product"
-        
-        return brand, name
+        return _split_brand_and_name(text)
 
     def _parse_from_text(self, text: str, limit: int) -> List[Product]:
         """Парсинг товаров из текста страницы (fallback метод)"""
         products = []
         
-        # Множественные паттерны для поиска товаров
-        patterns = [
-            # Паттерн 1: Цена + валюта + бренд + название
-            r'(\d{2,6}(?:\s+\d{3})*)\s*₸\s*([A-Za-z]+)\s+([А-Яа-я\s\w\-]{10,80})',
-            # Паттерн 2: Бренд + название + цена
-            r'([A-Za-z]+)\s+([А-Яа-я\s\w\-]{10,80})\s+(\d{2,6}(?:\s+\d{3})*)\s*₸',
-            # Паттерн 3: Только цены от 1000 до 999999 тенге
-            r'(\d{4,6})\s*₸',
-        ]
+        # Один проход по тексту: структурированные совпадения отдельно, цены отдельно
+        structured = []
+        price_matches = []
+        for match in _TEXT_PRODUCT_RE.finditer(text):
+            group = match.lastgroup
+            if group == 'p1_name':  # Паттерн 1: цена первая
+                structured.append((match['p1_price'], match['p1_brand'], match['p1_name']))
+            elif group == 'p2_price':  # Паттерн 2: цена последняя
+                structured.append((match['p2_price'], match['p2_brand'], match['p2_name']))
+            else:
+                price_matches.append(match)
         
-        # Сначала пробуем структурированные паттерны  
-        for pattern in patterns[:2]:
-            matches = re.findall(pattern, text, re.MULTILINE | re.IGNORECASE)
-            
-            if matches:
-                print(f"Found {len(matches)} matches with pattern")
-                for i, match in enumerate(matches[:limit]):
-                    try:
-                        if len(match) == 3:
-                            if pattern.startswith(r'(\d{2,6}'):  # Паттерн 1: цена первая
-                                price_str, brand, name = match
-                            else:  # Паттерн 2: цена последняя
-                                brand, name, price_str = match
-                            
-                            # Очищаем цену от пробелов и проверяем разумность
-                            price = float(price_str.replace(' ', ''))
-                            if price < 1000 or price > 999999:  # Разумные пределы цен в тенге
-                                continue
-                            
-                            # Очищаем название и бренд
-                            name = re.sub(r'\s+', ' ', name.strip())
-                            name = name[:80]  # Ограничиваем длину
-                            brand = brand.strip()
-                            
-                            if len(name) < 5 or len(brand) < 2:  # Минимальная длина
-                                continue
-                            
-                            sku = f"TXT{self.domain.upper()}{i + 1:04d}"
-                            
-                            # Пропускаем товары без реальных URL
-                            continue
-                            
-                    except Exception as e:
-                        print(f"Error parsing text match {i}: {e}")
+        # Сначала пробуем структурированные паттерны
+        if structured:
+            logger.debug("Found %s matches with pattern", len(structured))
+            for i, (price_str, brand, name) in enumerate(structured[:limit]):
+                try:
+                    # Очищаем цену от пробелов и проверяем разумность
+                    price = _normalize_price(price_str)
+                    if price < 1000 or price > 999999:  # Разумные пределы цен в тенге
                         continue
-                
-                if products:
-                    return products
+                    
+                    # Очищаем название и бренд
+                    name = _WS_RE.sub(' ', name.strip())
+                    name = name[:80]  # Ограничиваем длину
+                    brand = brand.strip()
+                    
+                    if len(name) < 5 or len(brand) < 2:  # Минимальная длина
+                        continue
+                    
+                    sku = f"TXT{self.domain.upper()}{i + 1:04d}"
+                    
+                    # Пропускаем товары без реальных URL
+                    continue
+                    
+                except Exception as e:
+                    logger.warning("Error parsing text match %s: %s", i, e)
+                    continue
+            
+            if products:
+                return products
         
         # Fallback: ищем просто цены и пытаемся найти рядом товары
-        print("Using fallback price-only parsing")
-        price_matches = re.findall(patterns[2], text)
+        logger.debug("Using fallback price-only parsing")
         
         if price_matches:
-            # Разбиваем текст на сегменты около цен
-            segments = re.split(r'\d{4,6}\s*₸', text)
-            
-            for i, price_str in enumerate(price_matches[:limit]):
+            for i, match in enumerate(price_matches[:limit]):
                 try:
-                    price = float(price_str)
+                    price = float(match['p3_price'])
                     if price < 1000 or price > 999999:
                         continue
                     
-                    # Берем текст до или после цены
-                    segment = ""
-                    if i < len(segments) - 1:
-                        segment = segments[i] + " " + segments[i + 1]
-                    elif i < len(segments):
-                        segment = segments[i]
+                    # Берем текст до и после цены (между соседними ценами)
+                    before_start = price_matches[i - 1].end() if i else 0
+                    after_end = price_matches[i + 1].start() if i + 1 < len(price_matches) else len(text)
+                    segment = text[before_start:match.start()] + " " + text[match.end():after_end]
                     
                     # Извлекаем бренд и название из сегмента
                     brand, name = self._extract_brand_and_name(segment)
@@ -1365,139 +1535,134 @@ class LamodaParser:
                     continue
                     
                 except Exception as e:
-                    print(f"Error parsing fallback match {i}: {e}")
+                    logger.warning("Error parsing fallback match %s: %s", i, e)
                     continue
         
         return products
 
     async def afetch_search(self, query: str, limit: int = 20, page: int = 1) -> List[Product]:
         """Асинхронный поиск товаров"""
+        return [product async for product in self.aiter_search(query, limit, page)]
+
+    async def _search_pages(self, query: str, limit: int, pages) -> List[List[Product]]:
+        """Параллельно загрузить несколько страниц поиска; результаты в порядке страниц"""
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(self._try_real_search(query, limit, p)) for p in pages]
+        return [t.result() for t in tasks]
+
+    async def aiter_search(self, query: str, limit: int = 20, page: int = 1) -> AsyncIterator[Product]:
+        """Асинхронный поиск, отдающий товары постранично по мере разбора страниц каталога"""
+        logger.debug("Searching for '%s' on %s domain", query, self.domain)
+        found = 0
+        seen_skus = set()
         try:
-            print(f"Searching for '{query}' on {self.domain} domain")
-            
-            # Стратегия 1: Реальный поиск
-            products = await self._try_real_search(query, limit, page)
-            if products:
-                print(f"Found {len(products)} products via real search")
-                return products
-            
-            # Стратегия 2: Демо режим как fallback
-            print("Real search failed, using demo mode...")
-            return self._generate_demo_products(query, limit)
-                
+            # Стратегия 1: Реальный поиск. Первая страница — одна (размер страницы
+            # неизвестен), следующие догружаются пачками параллельно
+            batch = 1
+            exhausted = False
+            while found < limit and not exhausted:
+                pages = range(page, page + batch)
+                page_results = await self._search_pages(query, limit - found, pages)
+                for products in page_results:
+                    added = 0
+                    for product in products:
+                        if found >= limit:
+                            break
+                        if product.sku in seen_skus:
+                            continue
+                        seen_skus.add(product.sku)
+                        found += 1
+                        added += 1
+                        yield product
+                    # Пустая страница или повтор уже отданных товаров — каталог закончился
+                    if not added:
+                        exhausted = True
+                        break
+                page += batch
+                # Сколько страниц еще нужно, оцениваем по числу товаров на последней
+                batch = min(_MAX_PARALLEL_PAGES, -(-(limit - found) // max(1, added)))
         except Exception as e:
-            print(f"Search failed: {e}")
-            # В случае ошибки тоже возвращаем демо данные
-            return self._generate_demo_products(query, limit)
+            logger.warning("Search failed: %s", e)
+
+        if found:
+            logger.debug("Found %s products via real search", found)
+            return
+
+        # Стратегия 2: Демо режим как fallback (в том числе при ошибке)
+        logger.warning("Real search failed, using demo mode...")
+        for product in self._generate_demo_products(query, limit):
+            yield product
 
     def _generate_demo_products(self, query: str, limit: int) -> List[Product]:
         """Генерировать демо товары для тестирования API"""
         demo_products = []
         
-        # Базовые товары для разных запросов
-        product_templates = {
-            'nike': [
-                {'name': 'Nike Air Max 270', 'brand': 'Nike', 'price': 12990, 'old_price': 15990},
-                {'name': 'Nike React Infinity Run', 'brand': 'Nike', 'price': 9990, 'old_price': None},
-                {'name': 'Nike Air Force 1', 'brand': 'Nike', 'price': 8990, 'old_price': 10990},
-            ],
-            'adidas': [
-                {'name': 'Adidas Ultraboost 22', 'brand': 'Adidas', 'price': 14990, 'old_price': None},
-                {'name': 'Adidas Stan Smith', 'brand': 'Adidas', 'price': 6990, 'old_price': 8990},
-                {'name': 'Adidas Gazelle', 'brand': 'Adidas', 'price': 7990, 'old_price': None},
-            ],
-            'puma': [
-                {'name': 'Puma Suede Classic', 'brand': 'Puma', 'price': 5990, 'old_price': None},
-                {'name': 'Puma RS-X', 'brand': 'Puma', 'price': 8990, 'old_price': 11990},
-                {'name': 'Puma Future Rider', 'brand': 'Puma', 'price': 6990, 'old_price': None},
-            ]
-        }
-        
         # Выбираем шаблоны на основе запроса
-        templates = []
+        templates = ()
         query_lower = query.lower()
         
-        for brand, products in product_templates.items():
+        for brand in _DEMO_BRAND_TOKENS:
             if brand in query_lower:
-                templates = products
+                templates = _DEMO_TEMPLATES[brand]
                 break
         
         # Если не нашли подходящий бренд, используем общие товары
         if not templates:
-            templates = [
-                {'name': f'Товар по запросу "{query}" #{i+1}', 'brand': 'Generic', 'price': 5000 + i * 1000, 'old_price': None}
+            templates = tuple(
+                (f'Товар по запросу "{query}" #{i+1}', 'Generic', 5000.0 + i * 1000, None)
                 for i in range(3)
-            ]
+            )
         
         # Генерируем товары
-        for i, template in enumerate(templates[:limit]):
-            sku = f"DEMO{query.upper()[:3]}{i+1:03d}"
+        sku_prefix = f"DEMO{query.upper()[:3]}"
+        for i, (name, brand, price, old_price) in enumerate(templates[:limit]):
+            sku = f"{sku_prefix}{i+1:03d}"
+            sku_lower = sku.lower()
             # Генерируем несколько демо изображений для товара
-            main_image = f"https://a.lmcdn.ru/img600x866/demo/{sku.lower()}_1.jpg"
-            demo_images = [
-                main_image,
-                f"https://a.lmcdn.ru/img600x866/demo/{sku.lower()}_2.jpg",
-                f"https://a.lmcdn.ru/img600x866/demo/{sku.lower()}_3.jpg"
-            ]
+            demo_images = tuple(
+                f"https://a.lmcdn.ru/img600x866/demo/{sku_lower}_{n}.jpg" for n in (1, 2, 3)
+            )
             
             demo_products.append(Product(
                 sku=sku,
-                name=template['name'],
-                brand=template['brand'],
-                price=float(template['price']),
-                old_price=float(template['old_price']) if template['old_price'] else None,
-                url=f"{self.base_url}/p/{sku.lower()}/demo-product-{i+1}/",
-                image_url=main_image,
+                name=name,
+                brand=brand,
+                price=price,
+                old_price=old_price,
+                url=f"{self.base_url}/p/{sku_lower}/demo-product-{i+1}/",
+                image_url=demo_images[0],
                 image_urls=demo_images
             ))
         
-        print(f"Generated {len(demo_products)} demo products")
+        logger.debug("Generated %s demo products", len(demo_products))
         return demo_products
 
     def fetch_search(self, query: str, limit: int = 20, page: int = 1) -> List[Product]:
         """Синхронный поиск товаров"""
-        return asyncio.run(self.afetch_search(query, limit, page))
+        async def _run():
+            try:
+                return await self.afetch_search(query, limit, page)
+            finally:
+                # Цикл asyncio.run завершается — его клиент больше не нужен
+                await self.aclose_shared()
+
+        return asyncio.run(_run())
 
     async def close(self):
-        """Закрыть HTTP сессию"""
-        if self.session:
-            await self.session.aclose()
-            self.session = None
-
-    def __del__(self):
-        """Деструктор для закрытия сессии"""
-        if self.session:
-            try:
-                asyncio.create_task(self.close())
-            except:
-                pass
+        """Отвязать внешнюю HTTP сессию (общий пул закрывается через aclose_shared)"""
+        self.session = None
+
+    async def __aenter__(self) -> "LamodaParser":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
 
 
     
     def _generate_sku_from_url(self, url: str, index: int) -> str:
         """Генерирует SKU из URL товара"""
-        try:
-            # Извлекаем код товара из URL
-            # Формат: https://www.lamoda.kz/p/mp002xw0zg9n/clothes-terranova-bryuki/
-            # Нужен артикул: mp002xw0zg9n
-            path_parts = urlparse(url).path.strip('/').split('/')
-            
-            # Ищем часть после /p/
-            if len(path_parts) >= 2 and path_parts[0] == 'p':
-                article_code = path_parts[1]
-                if len(article_code) >= 8 and article_code.replace('-', '').isalnum():
-                    return article_code.upper()
-            
-            # Fallback - ищем любую длинную алфавитно-цифровую часть
-            for part in path_parts:
-                if len(part) >= 8 and part.replace('-', '').replace('_', '').isalnum():
-                    return part.upper()
-            
-            # Последний fallback
-            return f"LMD{self.domain.upper()}{index + 1:04d}"
-            
-        except Exception:
-            return f"LMD{self.domain.upper()}{index + 1:04d}"
+        return _generate_sku_from_url(url, self.domain, index)
 
 
 # CLI интерфейс
@@ -1511,27 +1676,28 @@ if __name__ == "__main__":
     parser.add_argument("--page", type=int, default=1, help="Page number")
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
     
     async def main():
-        parser_instance = LamodaParser(domain=args.domain)
         try:
-            products = await parser_instance.afetch_search(args.query, args.limit, args.page)
+            async with LamodaParser(domain=args.domain) as parser_instance:
+                products = await parser_instance.afetch_search(args.query, args.limit, args.page)
             
-            if products:
-                print(f"\nFound {len(products)} products:")
-                for i, product in enumerate(products, 1):
-                    print(f"\n{i}. {product.name}")
-                    print(f"   Brand: {product.brand}")
-                    print(f"   Price: {product.price} {LAMODA_DOMAINS[args.domain]['currency']}")
-                    if product.old_price:
-                        print(f"   Old Price: {product.old_price} {LAMODA_DOMAINS[args.domain]['currency']}")
-                    print(f"   SKU: {product.sku}")
-                    print(f"   URL: {product.url}")
-                    if product.image_url:
-                        print(f"   Image: {product.image_url}")
-            else:
-                print("No products found")
+                if products:
+                    print(f"\nFound {len(products)} products:")
+                    for i, product in enumerate(products, 1):
+                        print(f"\n{i}. {product.name}")
+                        print(f"   Brand: {product.brand}")
+                        print(f"   Price: {product.price} {LAMODA_DOMAINS[args.domain]['currency']}")
+                        if product.old_price:
+                            print(f"   Old Price: {product.old_price} {LAMODA_DOMAINS[args.domain]['currency']}")
+                        print(f"   SKU: {product.sku}")
+                        print(f"   URL: {product.url}")
+                        if product.image_url:
+                            print(f"   Image: {product.image_url}")
+                else:
+                    print("No products found")
         finally:
-            await parser_instance.close()
+            await LamodaParser.aclose_shared()
     
     asyncio.run(main()) 
\ No newline at end of file
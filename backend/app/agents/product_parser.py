@@ -7,19 +7,200 @@ Modern Lamoda Product Parser
 """
 
 import asyncio
-import json
+import logging
 import re
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import List, Optional, Dict, Any
 from urllib.parse import urljoin, urlparse
 
 import httpx
-from bs4 import BeautifulSoup
+import orjson
+from lxml import etree, html as lxml_html
 
-from .parser_agent import Product
+from .http_client import aclose_shared_client, get_shared_client
+from .parser_agent import Product, _extract_price_cached
 
+logger = logging.getLogger(__name__)
 
-@dataclass
+
+# HTTP статусы, при которых имеет смысл повторить запрос
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Предел размера страницы товара: все нужные данные в первых мегабайтах,
+# хвост огромных страниц не читаем и не разбираем
+_MAX_PAGE_BYTES = 3_000_000
+
+# Сколько изображений галереи товара сохраняем
+_MAX_PAGE_IMAGES = 12
+
+# Регулярные выражения компилируются один раз при импорте модуля
+_JSONLD_RE = re.compile(r'\[?\{[^}]*"@type":\s*"Product"[^}]*\}[^}]*\}?\]?')
+_NUXT_RE = re.compile(r'var __NUXT__\s*=\s*({.*?});', re.DOTALL)
+_PRICE_PAGE_RE = re.compile(r'(\d{1,3}(?:\s+\d{3})*)\s*[₸₽]')
+
+# Бренды для разделения однострочного h1 на бренд и название
+_KNOWN_BRANDS = (
+    'Nike', 'Adidas', 'Puma', 'Reebok', 'Jordan', 'Converse',
+    'New Balance', 'Vans', 'Under Armour', 'Asics', 'Mizuno',
+    'Skechers', 'Fila', 'Kappa', 'Umbro', 'Diadora', 'Calvin Klein',
+    'Tommy Hilfiger', 'Lacoste', 'Polo Ralph Lauren', 'Hugo Boss',
+)
+
+# Ключевые слова типов товаров в названии
+_TYPE_KEYWORDS = {
+    'шорты': 'Шорты',
+    'кроссовки': 'Кроссовки',
+    'футболка': 'Футболка',
+    'платье': 'Платье',
+    'брюки': 'Брюки',
+    'джинсы': 'Джинсы',
+    'куртка': 'Куртка',
+    'свитер': 'Свитер',
+    'рубашка': 'Рубашка',
+    'юбка': 'Юбка',
+    'сабо': 'Сабо',
+    'кеды': 'Кеды',
+    'ботинки': 'Ботинки',
+    'сапоги': 'Сапоги',
+}
+
+# Бренды и типы ищутся одним проходом regex-движка вместо цикла сравнений.
+# Бренд — префикс h1 (match привязан к началу); длинные названия идут первыми,
+# чтобы составной бренд не перехватывался более коротким с тем же началом
+_BRAND_PREFIX_RE = re.compile('|'.join(map(re.escape, sorted(_KNOWN_BRANDS, key=len, reverse=True))))
+_TYPE_RE = re.compile('|'.join(map(re.escape, _TYPE_KEYWORDS)))
+# Приоритет типа — порядок в словаре (важен, если в названии несколько ключевых слов)
+_TYPE_PRIORITY = {keyword: i for i, keyword in enumerate(_TYPE_KEYWORDS)}
+
+
+# XPath-выражения компилируются один раз: выборка идет в libxml2 без
+# построения объектов BeautifulSoup для каждого узла страницы
+_XP_H1 = etree.XPath('(//h1)[1]')
+_XP_IMAGES = etree.XPath('//img')
+_XP_TEXT = etree.XPath('.//text()')
+_XP_PAGE_TEXT = etree.XPath('//text()[not(ancestor::script) and not(ancestor::style)]')
+
+# Кандидаты в цены — одна выборка по дереву вместо отдельного обхода на каждый
+# селектор; дальше узлы раскладываются по правилам ниже уже в Python
+_XP_PRICE_CANDIDATES = etree.XPath(
+    '//*[@data-testid="price-current" or @data-testid="price-old" or @data-testid="price"'
+    ' or contains(@class, "price")]'
+)
+
+# Правила (бывшие CSS-селекторы) цен страницы товара в порядке приоритета.
+# Аргументы: тег, data-testid, строка class, множество классов
+_PRICE_RULES = {
+    'current': (
+        lambda tag, testid, cls, classes: testid == 'price-current',
+        lambda tag, testid, cls, classes: 'price-current' in classes,
+        lambda tag, testid, cls, classes: 'price__current' in classes,
+        lambda tag, testid, cls, classes: 'product-price__current' in classes,
+        lambda tag, testid, cls, classes: tag == 'span' and 'price' in cls and 'current' in cls,
+        lambda tag, testid, cls, classes: tag == 'div' and 'price' in cls and 'current' in cls,
+    ),
+    'old': (
+        lambda tag, testid, cls, classes: testid == 'price-old',
+        lambda tag, testid, cls, classes: 'price-old' in classes,
+        lambda tag, testid, cls, classes: 'price__old' in classes,
+        lambda tag, testid, cls, classes: 'product-price__old' in classes,
+        lambda tag, testid, cls, classes: tag == 'span' and 'price' in cls and 'old' in cls,
+        lambda tag, testid, cls, classes: tag == 'div' and 'price' in cls and 'old' in cls,
+    ),
+    'single': (
+        lambda tag, testid, cls, classes: testid == 'price',
+        lambda tag, testid, cls, classes: 'price' in classes,
+        lambda tag, testid, cls, classes: 'product-price' in classes,
+        lambda tag, testid, cls, classes: tag == 'span' and 'price' in cls and 'old' not in cls,
+        lambda tag, testid, cls, classes: tag == 'div' and 'price' in cls and 'old' not in cls,
+    ),
+}
+
+
+def _price_elements(tree) -> Dict[str, List[Any]]:
+    """Для каждого правила — первый подходящий узел в порядке документа (как select_one)"""
+    found = {kind: [None] * len(rules) for kind, rules in _PRICE_RULES.items()}
+    for element in _XP_PRICE_CANDIDATES(tree):
+        tag = element.tag
+        testid = element.get('data-testid')
+        cls = element.get('class') or ''
+        classes = frozenset(cls.split())
+        for kind, rules in _PRICE_RULES.items():
+            slots = found[kind]
+            for i, rule in enumerate(rules):
+                if slots[i] is None and rule(tag, testid, cls, classes):
+                    slots[i] = element
+    # Порядок правил — приоритет; пустые места (нет узла) отбрасываем
+    return {kind: [element for element in slots if element is not None] for kind, slots in found.items()}
+
+
+# Маркеры JSON с данными товара в скриптах страницы
+_JSONLD_MARKER = b'"@type": "Product"'
+_NUXT_MARKER = b'var __NUXT__'
+
+
+def _iter_scripts_with(content: bytes, marker: bytes):
+    """Тексты <script>, содержащих marker, найденные по сырым байтам страницы.
+
+    bytes.find работает в C и проходит страницу быстрее, чем строится дерево;
+    без маркера на странице не делается вообще ничего.
+    """
+    pos = content.find(marker)
+    while pos != -1:
+        start = content.rfind(b'<script', 0, pos)
+        end = content.find(b'</script', pos)
+        if end == -1:
+            return
+        # Маркер должен быть внутри скрипта, а не в разметке между скриптами
+        if start != -1 and content.rfind(b'</script', start, pos) == -1:
+            body_start = content.find(b'>', start, pos) + 1
+            if body_start:
+                yield content[body_start:end].decode('utf-8', 'replace').strip()
+                # Остальные вхождения в этом же скрипте уже учтены
+                pos = content.find(marker, end)
+                continue
+        pos = content.find(marker, pos + len(marker))
+
+
+@lru_cache(maxsize=4096)
+def _generate_sku_from_url(url: str) -> str:
+    """Генерирует SKU из URL (кэш по URL: одна страница запрашивает SKU несколько раз)"""
+    try:
+        # Извлекаем код товара из URL
+        # Формат: https://www.lamoda.kz/p/mp002xw0zg9n/clothes-terranova-bryuki/
+        # Нужен артикул: mp002xw0zg9n
+        path_parts = urlparse(url).path.strip('/').split('/')
+        
+        # Ищем часть после /p/
+        if len(path_parts) >= 2 and path_parts[0] == 'p':
+            article_code = path_parts[1]
+            if len(article_code) >= 8 and article_code.replace('-', '').isalnum():
+                return article_code.upper()
+        
+        # Fallback - ищем любую длинную алфавитно-цифровую часть
+        for part in path_parts:
+            if len(part) >= 8 and part.replace('-', '').replace('_', '').isalnum():
+                return part.upper()
+        
+        # Последний fallback
+        return f"PARSE{hash(url) % 100000:05d}"
+        
+    except Exception:
+        return f"UNKNOWN{hash(url) % 100000:05d}"
+
+
+def _first(xpath: etree.XPath, tree) -> Optional[Any]:
+    """Первый узел по скомпилированному XPath или None"""
+    found = xpath(tree)
+    return found[0] if found else None
+
+
+def _text(element) -> str:
+    """Текст элемента как BeautifulSoup get_text(strip=True)"""
+    return ''.join(part.strip() for part in _XP_TEXT(element))
+
+
+@dataclass(slots=True)
 class ProductDetails:
     """Расширенные данные о товаре с дополнительными полями"""
     sku: str
@@ -42,7 +223,7 @@ class ProductDetails:
 class ModernLamodaParser:
     """Современный парсер товаров Lamoda по URL"""
     
-    def __init__(self, domain: str = "kz"):
+    def __init__(self, domain: str = "kz", session: Optional[httpx.AsyncClient] = None):
         self.domain = domain
         self.base_url = f"https://www.lamoda.{domain}"
         
@@ -50,89 +231,123 @@ class ModernLamodaParser:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
             'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': 'zstd, br, gzip',
             'DNT': '1',
-            'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         }
         
-        self.session = None
+        # Внешняя сессия или общий HTTP/2 клиент — парсер их не закрывает
+        self.session = session
 
     async def _get_session(self):
-        """Получить или создать HTTP сессию"""
-        if self.session is None:
-            timeout = httpx.Timeout(30.0)
-            self.session = httpx.AsyncClient(
-                headers=self.headers,
-                timeout=timeout,
-                follow_redirects=True
-            )
-        return self.session
+        """Получить HTTP сессию: внешнюю или общий клиент текущего event loop"""
+        return self.session or get_shared_client()
 
     async def parse_product_by_url(self, url: str) -> Optional[ProductDetails]:
         """Парсит товар Lamoda по URL"""
         try:
-            print(f"🔍 Parsing product: {url}")
+            logger.debug("Parsing product: %s", url)
             
-            session = await self._get_session()
-            response = await session.get(url)
+            content = await self.fetch_page(url)
+            if content is None:
+                return None
             
+            # Разбор — CPU-работа: в потоке, чтобы event loop продолжал обслуживать
+            # соседние запросы (parse_many); libxml2 отпускает GIL при построении дерева
+            return await asyncio.to_thread(self.parse_page, content, url)
+                
+        except Exception as e:
+            logger.warning("Error parsing %s: %s", url, e)
+            return None
+
+    async def parse_many(self, urls: List[str], concurrency: int = 12) -> List[Optional[ProductDetails]]:
+        """Парсит несколько товаров параллельно; результаты в порядке urls.
+
+        Семафор ограничивает число одновременных запросов (а не CPU): так
+        запросы перекрываются по сетевым задержкам, но не упираются в 429
+        и лимит соединений общего клиента.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _parse_one(url: str) -> Optional[ProductDetails]:
+            async with semaphore:
+                return await self.parse_product_by_url(url)
+
+        return await asyncio.gather(*(_parse_one(url) for url in urls))
+
+    async def fetch_page(self, url: str) -> Optional[bytes]:
+        """Загружает HTML страницы товара без разбора"""
+        session = await self._get_session()
+        async with session.stream('GET', url, headers=self.headers) as response:
+            if response.status_code in RETRYABLE_STATUS:
+                # Временная ошибка (429/5xx) — пусть решает вызывающий код
+                response.raise_for_status()
             if response.status_code != 200:
-                print(f"❌ HTTP {response.status_code} for {url}")
+                logger.warning("HTTP %s for %s", response.status_code, url)
                 return None
             
-            print(f"✅ Successfully fetched page (length: {len(response.text)})")
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Пробуем различные методы извлечения данных
-            product = self._parse_from_json(soup, url) or self._parse_from_html(soup, url)
-            
-            if product:
-                print(f"✅ Successfully parsed: {product.name} by {product.brand}")
-                return product
-            else:
-                print(f"❌ Failed to parse product from {url}")
+            # Читаем тело потоком (байты, без декодирования в str) до предела размера
+            chunks = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= _MAX_PAGE_BYTES:
+                    break
+        
+        content = b''.join(chunks)[:_MAX_PAGE_BYTES]
+        logger.debug("Fetched page length=%d url=%s", len(content), url)
+        return content
+
+    def parse_page(self, content: bytes, url: str) -> Optional[ProductDetails]:
+        """Синхронный разбор HTML страницы товара (без сетевых запросов)"""
+        # Сначала JSON в скриптах: он ищется по сырым байтам, и если нашелся,
+        # дерево страницы строить не нужно
+        product = self._parse_from_json(content, url)
+        if product is None:
+            # Дерево lxml напрямую: тот же libxml2, что и под BeautifulSoup, но без
+            # обертки Python-объектами каждого узла. Байты передаем как есть,
+            # кодировку определяет сам парсер
+            try:
+                tree = lxml_html.document_fromstring(content)
+            except (etree.ParserError, ValueError) as e:
+                logger.warning("Failed to parse product from %s: %s", url, e)
                 return None
-                
-        except Exception as e:
-            print(f"❌ Error parsing {url}: {e}")
+            product = self._parse_from_html(tree, url)
+        
+        if product:
+            logger.debug("Parsed: %s by %s", product.name, product.brand)
+            return product
+        else:
+            logger.warning("Failed to parse product from %s", url)
             return None
 
-    def _parse_from_json(self, soup: BeautifulSoup, url: str) -> Optional[ProductDetails]:
+    def _parse_from_json(self, content: bytes, url: str) -> Optional[ProductDetails]:
         """Извлекает данные товара из JSON в скриптах"""
         try:
-            scripts = soup.find_all('script')
-            
-            for script in scripts:
-                if not script.string:
-                    continue
-                    
-                content = script.string.strip()
-                
-                # Ищем JSON-LD структуру (schema.org)
-                if '"@type": "Product"' in content:
-                    product = self._parse_json_ld_product(content, url)
-                    if product:
-                        return product
-                
-                # Ищем __NUXT__ данные
-                if 'var __NUXT__' in content:
-                    product = self._parse_nuxt_data(content, url)
-                    if product:
-                        return product
+            # Ищем JSON-LD структуру (schema.org)
+            for script in _iter_scripts_with(content, _JSONLD_MARKER):
+                product = self._parse_json_ld_product(script, url)
+                if product:
+                    return product
+            
+            # Ищем __NUXT__ данные
+            for script in _iter_scripts_with(content, _NUXT_MARKER):
+                product = self._parse_nuxt_data(script, url)
+                if product:
+                    return product
             
             return None
             
         except Exception as e:
-            print(f"❌ Error parsing JSON: {e}")
+            logger.warning("Error parsing JSON: %s", e)
             return None
 
     def _parse_json_ld_product(self, content: str, url: str) -> Optional[ProductDetails]:
         """Парсит товар из JSON-LD структуры"""
         try:
             # Ищем JSON объект с продуктом
-            json_match = re.search(r'\[?\{[^}]*"@type":\s*"Product"[^}]*\}[^}]*\}?\]?', content)
+            json_match = _JSONLD_RE.search(content)
             if not json_match:
                 return None
             
@@ -144,7 +359,7 @@ class ModernLamodaParser:
             if json_str.startswith('[') and json_str.endswith(']'):
                 json_str = json_str[1:-1]
             
-            data = json.loads(json_str)
+            data = orjson.loads(json_str)
             
             # Извлекаем данные
             brand = "Unknown"
@@ -166,7 +381,7 @@ class ModernLamodaParser:
                         pass
             
             # SKU
-            sku = data.get('sku', self._generate_sku_from_url(url))
+            sku = data.get('sku', _generate_sku_from_url(url))
             
             # Изображения (пока пустые, будем искать в HTML)
             image_urls = []
@@ -185,19 +400,19 @@ class ModernLamodaParser:
             )
             
         except Exception as e:
-            print(f"❌ Error parsing JSON-LD: {e}")
+            logger.warning("Error parsing JSON-LD: %s", e)
             return None
 
     def _parse_nuxt_data(self, content: str, url: str) -> Optional[ProductDetails]:
         """Парсит товар из NUXT данных"""
         try:
             # Ищем payload в NUXT данных
-            nuxt_match = re.search(r'var __NUXT__\s*=\s*({.*?});', content, re.DOTALL)
+            nuxt_match = _NUXT_RE.search(content)
             if not nuxt_match:
                 return None
             
             # Парсим JSON
-            nuxt_data = json.loads(nuxt_match.group(1))
+            nuxt_data = orjson.loads(nuxt_match.group(1))
             
             # Ищем данные о товаре в различных местах
             payload = nuxt_data.get('payload', {})
@@ -207,19 +422,19 @@ class ModernLamodaParser:
             return None
             
         except Exception as e:
-            print(f"❌ Error parsing NUXT data: {e}")
+            logger.warning("Error parsing NUXT data: %s", e)
             return None
 
-    def _parse_from_html(self, soup: BeautifulSoup, url: str) -> Optional[ProductDetails]:
+    def _parse_from_html(self, tree: lxml_html.HtmlElement, url: str) -> Optional[ProductDetails]:
         """Парсит товар из HTML структуры с современными селекторами"""
         try:
             # Извлекаем название и бренд из h1
-            h1_tag = soup.find('h1')
-            if not h1_tag:
+            h1_tag = _first(_XP_H1, tree)
+            if h1_tag is None:
                 return None
             
-            h1_text = h1_tag.get_text(strip=True)
-            print(f"Found h1: {h1_text}")
+            h1_text = _text(h1_tag)
+            logger.debug("Found h1: %s", h1_text)
             
             # Пробуем разделить на бренд и название
             brand = "Unknown"
@@ -232,33 +447,28 @@ class ModernLamodaParser:
                 name = ' '.join(h1_lines[1:])
             else:
                 # Если одна строка, пытаемся разделить по известным брендам
-                known_brands = ['Nike', 'Adidas', 'Puma', 'Reebok', 'Jordan', 'Converse', 
-                               'New Balance', 'Vans', 'Under Armour', 'Asics', 'Mizuno',
-                               'Skechers', 'Fila', 'Kappa', 'Umbro', 'Diadora', 'Calvin Klein',
-                               'Tommy Hilfiger', 'Lacoste', 'Polo Ralph Lauren', 'Hugo Boss']
-                
-                for brand_name in known_brands:
-                    if h1_text.startswith(brand_name):
-                        brand = brand_name
-                        name = h1_text[len(brand_name):].strip()
-                        break
+                brand_match = _BRAND_PREFIX_RE.match(h1_text)
+                if brand_match:
+                    brand = brand_match.group()
+                    name = h1_text[brand_match.end():].strip()
             
             # Улучшенное извлечение цены из структуры страницы товара
             price = 0.0
             old_price = None
             
             # Сначала пытаемся найти цены в специфичных элементах
-            price_info = self._extract_detailed_prices(soup)
+            price_info = self._extract_detailed_prices(tree)
             if price_info:
                 price = price_info.get('current_price', 0.0)
                 old_price = price_info.get('old_price')
             
-            # Найдем изображения
+            # Найдем изображения (множество — для проверки дубликатов, список — для порядка)
             image_urls = []
+            seen_urls = set()
             
-            all_imgs = soup.find_all('img')
-            for img in all_imgs:
-                src = img.get('src') or img.get('data-src')
+            for img in _XP_IMAGES(tree):
+                attrs = img.attrib
+                src = attrs.get('src') or attrs.get('data-src')
                 if src and 'lmcdn.ru' in src:
                     # Нормализуем URL
                     if src.startswith('//'):
@@ -268,11 +478,14 @@ class ModernLamodaParser:
                     else:
                         full_url = src
                     
-                    if full_url not in image_urls:
+                    if full_url not in seen_urls:
+                        seen_urls.add(full_url)
                         image_urls.append(full_url)
+                        if len(image_urls) >= _MAX_PAGE_IMAGES:
+                            break
             
             # Генерируем SKU
-            sku = self._generate_sku_from_url(url)
+            sku = _generate_sku_from_url(url)
             
             # Извлекаем тип товара
             product_type = self._extract_type_from_name(name)
@@ -290,10 +503,10 @@ class ModernLamodaParser:
             )
             
         except Exception as e:
-            print(f"❌ Error parsing HTML: {e}")
+            logger.warning("Error parsing HTML: %s", e)
             return None
 
-    def _extract_detailed_prices(self, soup: BeautifulSoup) -> Optional[Dict[str, Optional[float]]]:
+    def _extract_detailed_prices(self, tree: lxml_html.HtmlElement) -> Optional[Dict[str, Optional[float]]]:
         """Детальное извлечение цен из страницы товара"""
         try:
             price_info = {
@@ -301,71 +514,40 @@ class ModernLamodaParser:
                 'old_price': None
             }
             
-            # Селекторы для страницы товара (не каталога)
-            price_selectors = {
-                'current': [
-                    '[data-testid="price-current"]',
-                    '.price-current',
-                    '.price__current',
-                    '.product-price__current',
-                    'span[class*="price"][class*="current"]',
-                    'div[class*="price"][class*="current"]'
-                ],
-                'old': [
-                    '[data-testid="price-old"]',
-                    '.price-old',
-                    '.price__old',
-                    '.product-price__old',
-                    'span[class*="price"][class*="old"]',
-                    'div[class*="price"][class*="old"]'
-                ],
-                'single': [
-                    '[data-testid="price"]',
-                    '.price',
-                    '.product-price',
-                    'span[class*="price"]:not([class*="old"])',
-                    'div[class*="price"]:not([class*="old"])'
-                ]
-            }
+            elements = _price_elements(tree)
             
             # Пытаемся найти актуальную цену
-            for selector in price_selectors['current']:
-                price_elem = soup.select_one(selector)
-                if price_elem:
-                    price_text = price_elem.get_text(strip=True)
-                    if price_text and ('₸' in price_text or '₽' in price_text):
-                        price = self._extract_price_from_text(price_text)
-                        if price:
-                            price_info['current_price'] = price
-                            break
+            for price_elem in elements['current']:
+                price_text = _text(price_elem)
+                if price_text and ('₸' in price_text or '₽' in price_text):
+                    price = self._extract_price_from_text(price_text)
+                    if price:
+                        price_info['current_price'] = price
+                        break
             
             # Пытаемся найти старую цену
-            for selector in price_selectors['old']:
-                old_price_elem = soup.select_one(selector)
-                if old_price_elem:
-                    old_price_text = old_price_elem.get_text(strip=True)
-                    if old_price_text and ('₸' in old_price_text or '₽' in old_price_text):
-                        old_price = self._extract_price_from_text(old_price_text)
-                        if old_price:
-                            price_info['old_price'] = old_price
-                            break
+            for old_price_elem in elements['old']:
+                old_price_text = _text(old_price_elem)
+                if old_price_text and ('₸' in old_price_text or '₽' in old_price_text):
+                    old_price = self._extract_price_from_text(old_price_text)
+                    if old_price:
+                        price_info['old_price'] = old_price
+                        break
             
             # Если актуальная цена не найдена, ищем единую цену
             if not price_info['current_price']:
-                for selector in price_selectors['single']:
-                    price_elem = soup.select_one(selector)
-                    if price_elem:
-                        price_text = price_elem.get_text(strip=True)
-                        if price_text and ('₸' in price_text or '₽' in price_text):
-                            price = self._extract_price_from_text(price_text)
-                            if price:
-                                price_info['current_price'] = price
-                                break
+                for price_elem in elements['single']:
+                    price_text = _text(price_elem)
+                    if price_text and ('₸' in price_text or '₽' in price_text):
+                        price = self._extract_price_from_text(price_text)
+                        if price:
+                            price_info['current_price'] = price
+                            break
             
             # Fallback: поиск по всему тексту страницы
             if not price_info['current_price']:
-                page_text = soup.get_text()
-                price_matches = re.findall(r'(\d{1,3}(?:\s+\d{3})*)\s*[₸₽]', page_text)
+                page_text = ''.join(_XP_PAGE_TEXT(tree))
+                price_matches = _PRICE_PAGE_RE.findall(page_text)
                 
                 if price_matches:
                     prices = []
@@ -389,101 +571,25 @@ class ModernLamodaParser:
             return price_info if price_info['current_price'] else None
             
         except Exception as e:
-            print(f"❌ Error extracting detailed prices: {e}")
+            logger.warning("Error extracting detailed prices: %s", e)
             return None
 
     def _extract_price_from_text(self, text: str) -> Optional[float]:
-        """Извлечение цены из текста (аналог метода из parser_agent)"""
+        """Извлечение цены из текста (общая кэшируемая реализация parser_agent)"""
         if not text:
             return None
-        
-        # Очищаем от HTML тегов и лишних символов
-        text = re.sub(r'<[^>]+>', '', text)
-        text = text.strip()
-        
-        # Убираем валютные символы
-        clean_text = text.replace('₸', '').replace('₽', '').replace('р.', '').strip()
-        
-        # Паттерн для цен с пробелами
-        price_pattern = r'\b(\d{1,3}(?:\s+\d{3})*)\b'
-        matches = re.findall(price_pattern, clean_text)
-        
-        if matches:
-            price_str = matches[0].replace(' ', '')
-            try:
-                price = float(price_str)
-                if 100 <= price <= 10000000:
-                    return price
-            except ValueError:
-                pass
-        
-        # Fallback: числа без пробелов
-        fallback_pattern = r'\b(\d{3,7})\b'
-        fallback_matches = re.findall(fallback_pattern, clean_text)
-        
-        if fallback_matches:
-            for match in fallback_matches:
-                try:
-                    price = float(match)
-                    if 100 <= price <= 10000000:
-                        return price
-                except ValueError:
-                    continue
-        
-        return None
-
-    def _generate_sku_from_url(self, url: str) -> str:
-        """Генерирует SKU из URL"""
-        try:
-            # Извлекаем код товара из URL
-            # Формат: https://www.lamoda.kz/p/mp002xw0zg9n/clothes-terranova-bryuki/
-            # Нужен артикул: mp002xw0zg9n
-            path_parts = urlparse(url).path.strip('/').split('/')
-            
-            # Ищем часть после /p/
-            if len(path_parts) >= 2 and path_parts[0] == 'p':
-                article_code = path_parts[1]
-                if len(article_code) >= 8 and article_code.replace('-', '').isalnum():
-                    return article_code.upper()
-            
-            # Fallback - ищем любую длинную алфавитно-цифровую часть
-            for part in path_parts:
-                if len(part) >= 8 and part.replace('-', '').replace('_', '').isalnum():
-                    return part.upper()
-            
-            # Последний fallback
-            return f"PARSE{hash(url) % 100000:05d}"
-            
-        except Exception:
-            return f"UNKNOWN{hash(url) % 100000:05d}"
+        return _extract_price_cached(text)
 
     def _extract_type_from_name(self, name: str) -> str:
         """Извлекает тип товара из названия"""
         name_lower = name.lower()
         
-        # Словарь типов товаров
-        type_keywords = {
-            'шорты': 'Шорты',
-            'кроссовки': 'Кроссовки', 
-            'футболка': 'Футболка',
-            'платье': 'Платье',
-            'брюки': 'Брюки',
-            'джинсы': 'Джинсы',
-            'куртка': 'Куртка',
-            'свитер': 'Свитер',
-            'рубашка': 'Рубашка',
-            'юбка': 'Юбка',
-            'сабо': 'Сабо',
-            'кеды': 'Кеды',
-            'ботинки': 'Ботинки',
-            'сапоги': 'Сапоги'
-        }
-        
-        for keyword, type_name in type_keywords.items():
-            if keyword in name_lower:
-                return type_name
+        keywords = _TYPE_RE.findall(name_lower)
+        if not keywords:
+            return "Товар"
         
-        return "Товар"
+        keyword = keywords[0] if len(keywords) == 1 else min(keywords, key=_TYPE_PRIORITY.__getitem__)
+        return _TYPE_KEYWORDS[keyword]
 
     def to_product(self, product_details: ProductDetails) -> Product:
         """Конвертирует ProductDetails в стандартный Product"""
@@ -495,43 +601,66 @@ class ModernLamodaParser:
             old_price=product_details.old_price,
             url=product_details.url,
             image_url=product_details.image_url,
-            image_urls=product_details.image_urls
+            image_urls=tuple(product_details.image_urls or ())
         )
 
     async def close(self):
-        """Закрытие HTTP сессии"""
-        if self.session:
-            await self.session.aclose()
-            self.session = None
+        """Отвязать внешнюю HTTP сессию (общий клиент закрывается aclose_shared_client)"""
+        self.session = None
+
+    async def __aenter__(self) -> "ModernLamodaParser":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+# Парсеры для разбора HTML в воркерах процесса (без HTTP сессии)
+_page_parsers: Dict[str, ModernLamodaParser] = {}
+
+
+def parse_product_html(content: bytes, url: str, domain: str = "kz") -> Optional[ProductDetails]:
+    """Разбор страницы товара для запуска в ProcessPoolExecutor.
+
+    Функция модульного уровня, чтобы ее можно было передать в другой процесс.
+    """
+    parser = _page_parsers.get(domain)
+    if parser is None:
+        parser = _page_parsers[domain] = ModernLamodaParser(domain=domain)
+    try:
+        return parser.parse_page(content, url)
+    except Exception as e:
+        logger.warning("Error parsing %s: %s", url, e)
+        return None
 
 
 # Пример использования
 async def test_product_parser():
     """Тестирование парсера товаров"""
-    parser = ModernLamodaParser(domain="kz")
-    
-    # Тестовые URL
-    test_urls = [
-        "https://www.lamoda.kz/p/rtlaek537801/",  # Nike шорты
-    ]
+    async with ModernLamodaParser(domain="kz") as parser:
+        # Тестовые URL
+        test_urls = [
+            "https://www.lamoda.kz/p/rtlaek537801/",  # Nike шорты
+        ]
     
-    for url in test_urls:
-        product = await parser.parse_product_by_url(url)
-        if product:
-            print(f"\n✅ SUCCESS:")
-            print(f"   SKU: {product.sku}")
-            print(f"   Name: {product.name}")
-            print(f"   Brand: {product.brand}")
-            print(f"   Price: {product.price}₸")
-            if product.old_price:
-                print(f"   Old Price: {product.old_price}₸")
-            print(f"   Type: {product.type}")
-            print(f"   Images: {len(product.image_urls)}")
-        else:
-            print(f"❌ FAILED to parse {url}")
+        for url in test_urls:
+            product = await parser.parse_product_by_url(url)
+            if product:
+                print(f"\n✅ SUCCESS:")
+                print(f"   SKU: {product.sku}")
+                print(f"   Name: {product.name}")
+                print(f"   Brand: {product.brand}")
+                print(f"   Price: {product.price}₸")
+                if product.old_price:
+                    print(f"   Old Price: {product.old_price}₸")
+                print(f"   Type: {product.type}")
+                print(f"   Images: {len(product.image_urls)}")
+            else:
+                print(f"❌ FAILED to parse {url}")
     
-    await parser.close()
+    await aclose_shared_client()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     asyncio.run(test_product_parser()) 
\ No newline at end of file
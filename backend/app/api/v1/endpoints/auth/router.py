@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, Body, HTTPException, status, Header
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
@@ -42,17 +44,18 @@ async def google_callback(code: str, db: Session = Depends(get_db)):
     return await service.google_callback(db, code)
 
 
+# Refresh/logout only touch JWTs and the Redis blacklist, so they don't open a DB session;
+# the blocking Redis calls run in a worker thread instead of the endpoint threadpool hop
 @router.post("/refresh", response_model=TokensOut)
-def refresh_token_route(body: RefreshTokenIn, db: Session = Depends(get_db)):
-    return service.refresh_token(body)
+async def refresh_token_route(body: RefreshTokenIn):
+    return await asyncio.to_thread(service.refresh_token, body)
 
 
 @router.post("/logout")
-def logout(
+async def logout(
     authorization: Annotated[str | None, Header()] = None,
     body: RefreshTokenIn = Body(..., embed=True),
-    db: Session = Depends(get_db),
 ):
     token = authorization.split(" ")[1] if authorization else ""
-    service.logout(token, body.refresh_token)
+    await asyncio.to_thread(service.logout, token, body.refresh_token)
     return {"message": "Successfully logged out"} 
\ No newline at end of file
@@ -1,16 +1,21 @@
-from pydantic import BaseModel, EmailStr, constr
+from typing import Annotated
+
+from pydantic import BaseModel, EmailStr, Field
 from app.api.v1.endpoints.profile.schemas import ProfileOut
 
 
 class UserCreate(BaseModel):
     email: EmailStr
-    password: constr(min_length=8)
+    password: Annotated[str, Field(min_length=8)]
 
 
 class TokenOut(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
+    class Config:
+        frozen = True
+
 
 class TokensOut(TokenOut):
     refresh_token: str
@@ -21,4 +26,7 @@ class TokensUserOut(TokensOut):
 
 
 class RefreshTokenIn(BaseModel):
-    refresh_token: str 
\ No newline at end of file
+    refresh_token: str
+
+    class Config:
+        frozen = True
@@ -1,8 +1,15 @@
-from datetime import timedelta, datetime
+from datetime import timedelta
+from time import time as _now
+from functools import lru_cache
+from typing import Optional
 from urllib.parse import urlencode
-from authlib.integrations.httpx_client import AsyncOAuth2Client
 
+import httpx
+from cachetools import TTLCache
+from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.core.security import get_password_hash, create_access_token, authenticate_user, blacklist_token, decode_token, create_refresh_token, blacklist_refresh_token, decode_refresh_token, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
@@ -17,6 +24,8 @@ settings = get_settings()
 GOOGLE_AUTH_ENDPOINT = "https://accounts.google.com/o/oauth2/v2/auth"
 GOOGLE_TOKEN_ENDPOINT = "https://oauth2.googleapis.com/token"
 GOOGLE_USERINFO_ENDPOINT = "https://www.googleapis.com/oauth2/v2/userinfo"
+GOOGLE_CERTS_ENDPOINT = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ["https://accounts.google.com", "accounts.google.com"]
 SCOPES = ["openid", "email", "profile"]
 
 
@@ -50,38 +59,98 @@ def login(db: Session, form_data):
     return TokensUserOut(access_token=access_token, refresh_token=refresh_token, user=ProfileOut.from_orm(user))
 
 
+# Built from static settings only, so it never changes for the process lifetime
+_GOOGLE_AUTH_URL = f"{GOOGLE_AUTH_ENDPOINT}?" + urlencode({
+    "client_id": settings.GOOGLE_CLIENT_ID,
+    "response_type": "code",
+    "redirect_uri": settings.GOOGLE_REDIRECT_URI,
+    "scope": " ".join(SCOPES),
+    "access_type": "offline",
+    "prompt": "consent",
+})
+
+
 def google_login():
-    params = {
-        "client_id": settings.GOOGLE_CLIENT_ID,
-        "response_type": "code",
-        "redirect_uri": settings.GOOGLE_REDIRECT_URI,
-        "scope": " ".join(SCOPES),
-        "access_type": "offline",
-        "prompt": "consent",
-    }
-    url = f"{GOOGLE_AUTH_ENDPOINT}?{urlencode(params)}"
-    return {"auth_url": url}
+    return {"auth_url": _GOOGLE_AUTH_URL}
+
+
+@lru_cache(maxsize=1)
+def _google_http() -> httpx.AsyncClient:
+    """Shared keep-alive client for Google OAuth endpoints."""
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=5.0,
+        limits=httpx.Limits(max_keepalive_connections=100),
+    )
+
+
+async def aclose_google_http() -> None:
+    if _google_http.cache_info().currsize:
+        await _google_http().aclose()
+        _google_http.cache_clear()
+
+
+_google_jwks: "TTLCache[str, dict]" = TTLCache(maxsize=1, ttl=3600)
+
+
+async def _google_certs() -> dict:
+    jwks = _google_jwks.get("certs")
+    if jwks is None:
+        resp = await _google_http().get(GOOGLE_CERTS_ENDPOINT)
+        resp.raise_for_status()
+        jwks = _google_jwks["certs"] = resp.json()
+    return jwks
+
+
+async def _verify_google_id_token(token: dict) -> dict:
+    """Return verified id_token claims, or {} when they can't be used."""
+    id_token = token.get("id_token")
+    if not id_token:
+        return {}
+    try:
+        return jwt.decode(
+            id_token,
+            await _google_certs(),
+            algorithms=["RS256"],
+            audience=settings.GOOGLE_CLIENT_ID,
+            issuer=GOOGLE_ISSUERS,
+            access_token=token.get("access_token"),
+        )
+    except (JWTError, httpx.HTTPError):
+        return {}
 
 
 async def google_callback(db: Session, code: str):
     if not code:
         raise HTTPException(status_code=400, detail="Code not provided")
 
-    async with AsyncOAuth2Client(
-        client_id=settings.GOOGLE_CLIENT_ID,
-        client_secret=settings.GOOGLE_CLIENT_SECRET,
-    ) as client:
-        token = await client.fetch_token(
-            GOOGLE_TOKEN_ENDPOINT,
-            code=code,
-            grant_type="authorization_code",
-            redirect_uri=settings.GOOGLE_REDIRECT_URI,
+    client = _google_http()
+    token_resp = await client.post(
+        GOOGLE_TOKEN_ENDPOINT,
+        data={
+            "code": code,
+            "client_id": settings.GOOGLE_CLIENT_ID,
+            "client_secret": settings.GOOGLE_CLIENT_SECRET,
+            "redirect_uri": settings.GOOGLE_REDIRECT_URI,
+            "grant_type": "authorization_code",
+        },
+    )
+    if token_resp.status_code != 200:
+        raise HTTPException(status_code=400, detail="Could not exchange code with Google")
+    token = token_resp.json()
+
+    # Profile claims come from the signed id_token; userinfo is only a fallback
+    data = await _verify_google_id_token(token)
+    if not data.get("email") or "picture" not in data:
+        resp = await client.get(
+            GOOGLE_USERINFO_ENDPOINT,
+            params={"alt": "json"},
+            headers={"Authorization": f"Bearer {token.get('access_token', '')}"},
         )
-        resp = await client.get(GOOGLE_USERINFO_ENDPOINT, params={"alt": "json"})
-    if resp.status_code != 200:
-        raise HTTPException(status_code=400, detail="Could not fetch user info from Google")
+        if resp.status_code != 200:
+            raise HTTPException(status_code=400, detail="Could not fetch user info from Google")
+        data = resp.json()
 
-    data = resp.json()
     email = data.get("email")
     if not email:
         raise HTTPException(status_code=400, detail="Email not available")
@@ -90,38 +159,52 @@ async def google_callback(db: Session, code: str):
     given_name = data.get("given_name")
     family_name = data.get("family_name")
 
-    user = db.query(User).filter(User.email == email.lower()).first()
+    email = email.lower()
+    profile = {"avatar": picture, "first_name": given_name, "last_name": family_name}
+    # Existing users: one UPDATE .. RETURNING that only fills blank profile fields
+    fill_blanks = {
+        name: func.coalesce(func.nullif(getattr(User, name), ""), value)
+        for name, value in profile.items()
+        if value
+    }
+    if fill_blanks:
+        user = _returning_user(db, update(User).where(User.email == email).values(**fill_blanks))
+    else:
+        user = db.query(User).filter(User.email == email).first()
     if user is None:
-        user = User(
-            email=email.lower(),
+        # Hash only for genuinely new users; ON CONFLICT covers a concurrent first login
+        insert_stmt = pg_insert(User).values(
+            email=email,
             hashed_password=get_password_hash(token.get("access_token", email)),
             is_admin=False,
-            avatar=picture,
-            first_name=given_name,
-            last_name=family_name,
+            **profile,
+        )
+        user = _returning_user(
+            db,
+            insert_stmt.on_conflict_do_update(
+                index_elements=[User.email],
+                set_={name: func.coalesce(func.nullif(getattr(User, name), ""), insert_stmt.excluded[name]) for name in profile},
+            ),
         )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    else:
-        updated = False
-        if picture and not user.avatar:
-            user.avatar = picture
-            updated = True
-        if given_name and not user.first_name:
-            user.first_name = given_name
-            updated = True
-        if family_name and not user.last_name:
-            user.last_name = family_name
-            updated = True
-        if updated:
-            db.add(user)
-            db.commit()
-            db.refresh(user)
 
     access_token = create_access_token({"sub": str(user.id)})
     refresh_token = create_refresh_token({"sub": str(user.id)})
-    return TokensUserOut(access_token=access_token, refresh_token=refresh_token, user=ProfileOut.from_orm(user))
+    result = TokensUserOut(access_token=access_token, refresh_token=refresh_token, user=ProfileOut.from_orm(user))
+    db.commit()
+    return result
+
+
+def _returning_user(db: Session, stmt) -> Optional[User]:
+    """Execute INSERT/UPDATE .. RETURNING and map the row onto a User instance."""
+    orm_stmt = select(User).from_statement(stmt.returning(*User.__table__.c))
+    return db.execute(orm_stmt.execution_options(populate_existing=True)).scalars().first()
+
+
+def _ttl_from_exp(exp_ts) -> Optional[int]:
+    """Seconds left until a token's exp claim (0 if already expired)."""
+    if exp_ts is None:
+        return None
+    return max(0, int(exp_ts - _now()))
 
 
 def refresh_token(body: RefreshTokenIn):
@@ -132,12 +215,7 @@ def refresh_token(body: RefreshTokenIn):
     if sub is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token payload")
         
-    exp_ts = rt_payload.get("exp")
-    ttl = None
-    if exp_ts is not None:
-        ttl_calc = int(exp_ts - datetime.utcnow().timestamp())
-        ttl = ttl_calc if ttl_calc > 0 else 0
-    blacklist_refresh_token(refresh_token, ttl)
+    blacklist_refresh_token(refresh_token, _ttl_from_exp(rt_payload.get("exp")))
 
     access_token = create_access_token({"sub": str(sub)})
     new_refresh_token = create_refresh_token({"sub": str(sub)})
@@ -146,22 +224,12 @@ def refresh_token(body: RefreshTokenIn):
 
 def logout(token: str, refresh_token: str = None):
     payload = decode_token(token)
-    exp_ts = payload.get("exp")
-    ttl = None
-    if exp_ts is not None:
-        ttl_calc = int(exp_ts - datetime.utcnow().timestamp())
-        ttl = ttl_calc if ttl_calc > 0 else 0
-    blacklist_token(token, ttl)
+    blacklist_token(token, _ttl_from_exp(payload.get("exp")))
 
     if refresh_token:
         try:
             rt_payload = decode_refresh_token(refresh_token)
-            exp_ts_rt = rt_payload.get("exp")
-            ttl_rt = None
-            if exp_ts_rt is not None:
-                ttl_calc_rt = int(exp_ts_rt - datetime.utcnow().timestamp())
-                ttl_rt = ttl_calc_rt if ttl_calc_rt > 0 else 0
-            blacklist_refresh_token(refresh_token, ttl_rt)
+            blacklist_refresh_token(refresh_token, _ttl_from_exp(rt_payload.get("exp")))
         except HTTPException:
             pass
 
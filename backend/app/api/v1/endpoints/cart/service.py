@@ -1,8 +1,9 @@
-from typing import List, Optional
+from typing import Iterable, List, Optional
 
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import joinedload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.db.models.user import User
 from app.db.models.item import Item
@@ -11,118 +12,142 @@ from app.db.models.cart import CartItem
 from .schemas import QuantityUpdate, CartStateOut, CartItemOut
 
 
-def _cart_state(db: Session, user_id: int) -> CartStateOut:
-    """Internal helper to compute cart items and aggregates for given user."""
-    cart_items = (
+def _load_cart(db: Session, user_id: int) -> List[CartItem]:
+    """Load user's cart rows with variant and item in a single query."""
+    return (
         db.query(CartItem)
         .filter(CartItem.user_id == user_id)
         .options(
-            joinedload(CartItem.variant).joinedload(ItemVariant.item)
+            # Only the columns CartItemOut reads; items rows are wide (descriptions etc.)
+            joinedload(CartItem.variant)
+            .load_only(ItemVariant.size, ItemVariant.color, ItemVariant.sku, ItemVariant.stock, ItemVariant.price)
+            .joinedload(ItemVariant.item)
+            .load_only(Item.id, Item.name, Item.brand, Item.image_url, Item.price)
         )
         .all()
     )
 
-    items_out = []
-    total_items = 0
-    total_price = 0.0
 
+def _find_cart_item(cart_items: List[CartItem], variant_id: int) -> Optional[CartItem]:
+    return next((ci for ci in cart_items if ci.variant_id == variant_id), None)
+
+
+def _cart_state(cart_items: Iterable[CartItem]) -> CartStateOut:
+    """Internal helper to compute cart items and aggregates from loaded cart rows.
+
+    Rows come straight from the DB, so models are built with construct()
+    and skip validation.
+    """
+    items_out = []
     for ci in cart_items:
-        item = ci.variant.item
-        variant_price = ci.variant.price if ci.variant.price is not None else item.price
-        
+        variant = ci.variant
+        item = variant.item
         items_out.append(
-            CartItemOut(
+            CartItemOut.construct(
                 item_id=item.id,
                 variant_id=ci.variant_id,
                 name=item.name,
                 brand=item.brand,
                 image_url=item.image_url,
-                size=ci.variant.size,
-                color=ci.variant.color,
-                sku=ci.variant.sku,
-                stock=ci.variant.stock,
+                size=variant.size,
+                color=variant.color,
+                sku=variant.sku,
+                stock=variant.stock,
                 quantity=ci.quantity,
-                price=variant_price,
+                price=variant.price if variant.price is not None else item.price,
             )
         )
-        total_items += ci.quantity
-        total_price += ci.quantity * (variant_price or 0)
 
-    return CartStateOut(
+    # Totals from the plain models already built, not the instrumented ORM rows
+    return CartStateOut.construct(
         items=items_out,
-        total_items=total_items,
-        total_price=total_price,
+        total_items=sum(co.quantity for co in items_out),
+        total_price=float(sum(co.quantity * (co.price or 0) for co in items_out)),
     )
 
 
+def _commit_with_state(db: Session, cart_items: List[CartItem]) -> CartStateOut:
+    """Flush changes, build the response from in-memory rows, then commit.
+
+    The state is built before commit because commit expires loaded objects
+    and reading them afterwards would re-select every row.
+    """
+    db.flush()
+    state = _cart_state(cart_items)
+    db.commit()
+    return state
+
+
 def get_cart_state(db: Session, user: User) -> CartStateOut:
-    return _cart_state(db, user.id)
+    return _cart_state(_load_cart(db, user.id))
 
 
 def add_to_cart(db: Session, user: User, variant_id: int, qty: int = 1):
     if qty <= 0:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Quantity must be > 0")
 
-    variant = db.get(ItemVariant, variant_id)
+    # Lock the variant row so the stock check below holds until commit
+    variant = (
+        db.query(ItemVariant)
+        .filter(ItemVariant.id == variant_id)
+        .with_for_update()
+        .one_or_none()
+    )
     if not variant:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item variant not found")
 
-    cart_item = (
-        db.query(CartItem)
-        .filter(CartItem.user_id == user.id, CartItem.variant_id == variant_id)
-        .first()
-    )
+    if qty > variant.stock:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Not enough stock for variant. Available: {variant.stock}")
 
-    current_qty_in_cart = cart_item.quantity if cart_item else 0
-    
-    if (qty + current_qty_in_cart) > variant.stock:
+    # Insert or increment in one statement; concurrent adds of the same
+    # variant no longer race on uq_cart_user_variant
+    upsert = (
+        pg_insert(CartItem)
+        .values(user_id=user.id, variant_id=variant_id, quantity=qty)
+        .on_conflict_do_update(
+            constraint="uq_cart_user_variant",
+            set_={"quantity": CartItem.__table__.c.quantity + qty},
+        )
+        .returning(CartItem.quantity)
+    )
+    new_qty = db.execute(upsert).scalar_one()
+    if new_qty > variant.stock:
+        db.rollback()
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Not enough stock for variant. Available: {variant.stock}")
 
-    if cart_item:
-        cart_item.quantity += qty
-    else:
-        cart_item = CartItem(user_id=user.id, variant_id=variant_id, quantity=qty)
-        db.add(cart_item)
-        
-    db.commit()
-    return _cart_state(db, user.id)
+    return _commit_with_state(db, _load_cart(db, user.id))
 
 
 def update_cart_item(db: Session, user: User, variant_id: int, payload: QuantityUpdate):
-    cart_item = (
-        db.query(CartItem)
-        .filter(CartItem.user_id == user.id, CartItem.variant_id == variant_id)
-        .first()
-    )
+    cart_items = _load_cart(db, user.id)
+    cart_item = _find_cart_item(cart_items, variant_id)
     if not cart_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not in cart")
 
     if payload.quantity <= 0:
         db.delete(cart_item)
+        cart_items.remove(cart_item)
     else:
         if payload.quantity > cart_item.variant.stock:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Not enough stock. Available: {cart_item.variant.stock}")
         cart_item.quantity = payload.quantity
         
-    db.commit()
-    return _cart_state(db, user.id)
+    return _commit_with_state(db, cart_items)
 
 
 def remove_cart_item(db: Session, user: User, variant_id: int):
-    cart_item = (
-        db.query(CartItem)
-        .filter(CartItem.user_id == user.id, CartItem.variant_id == variant_id)
-        .first()
-    )
+    cart_items = _load_cart(db, user.id)
+    cart_item = _find_cart_item(cart_items, variant_id)
     if not cart_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not in cart")
     
     db.delete(cart_item)
-    db.commit()
-    return _cart_state(db, user.id)
+    cart_items.remove(cart_item)
+    return _commit_with_state(db, cart_items)
 
 
 def clear_cart(db: Session, user: User):
-    db.query(CartItem).filter(CartItem.user_id == user.id).delete()
+    # The session ends with the request, no need to sweep the identity map
+    db.query(CartItem).filter(CartItem.user_id == user.id).delete(synchronize_session=False)
     db.commit()
-    return _cart_state(db, user.id) 
\ No newline at end of file
+    return CartStateOut.construct(items=[], total_items=0, total_price=0.0)
@@ -6,7 +6,7 @@ from app.core.database import get_db
 from app.core.security import require_admin, get_current_user_optional, get_current_user
 from app.db.models.user import User
 from . import service
-from .schemas import ItemOut, ItemUpdate, VariantOut, VariantCreate, VariantUpdate, CommentOut, CommentCreate, ItemImageOut, LamodaImportRequest, LamodaImportResponse
+from .schemas import ItemOut, ItemFilters, ItemUpdate, VariantOut, VariantCreate, VariantUpdate, CommentOut, CommentCreate, ItemImageOut, LamodaImportRequest, LamodaImportResponse
 
 router = APIRouter(prefix="/items", tags=["Items"])
 
@@ -36,29 +36,10 @@ async def create_item(
 def list_items(
     skip: int = 0,
     limit: int = 100,
-    q: Optional[str] = None,
-    category: Optional[str] = None,
-    style: Optional[str] = None,
-    collection: Optional[str] = None,
-    min_price: Optional[float] = None,
-    max_price: Optional[float] = None,
-    size: Optional[str] = None,
-    sort_by: Optional[str] = None,
-    clothing_type: Optional[str] = None,
+    filters: ItemFilters = Depends(),
     db: Session = Depends(get_db),
     user: Optional[User] = Depends(get_current_user_optional),
 ):
-    filters = {
-        "q": q,
-        "category": category,
-        "style": style,
-        "collection": collection,
-        "min_price": min_price,
-        "max_price": max_price,
-        "size": size,
-        "sort_by": sort_by,
-        "clothing_type": clothing_type,
-    }
     return service.list_items(db, filters, skip, limit, user.id if user else None)
 
 
@@ -99,6 +99,19 @@ class CommentOut(CommentCreate):
 # Images
 
 
+class ItemFilters(BaseModel):
+    """Query filters for the item list (injected via Depends)."""
+    q: Optional[str] = None
+    category: Optional[str] = None
+    style: Optional[str] = None
+    collection: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    size: Optional[str] = None
+    sort_by: Optional[str] = None
+    clothing_type: Optional[str] = None
+
+
 class ItemImageOut(BaseModel):
     id: int
     image_url: str
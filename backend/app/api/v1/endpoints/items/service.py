@@ -11,7 +11,7 @@ from app.db.models.associations import user_favorite_items, UserView
 from app.db.models.comment import Comment
 from app.db.models.variant import ItemVariant
 from app.db.models.item_image import ItemImage
-from .schemas import ItemUpdate, VariantCreate, VariantUpdate, CommentCreate
+from .schemas import ItemFilters, ItemUpdate, VariantCreate, VariantUpdate, CommentCreate
 
 
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads/items")
@@ -112,7 +112,7 @@ async def create_item(
     return db_item
 
 
-def list_items(db: Session, filters: dict, skip: int = 0, limit: int = 100, user_id: Optional[int] = None):
+def list_items(db: Session, filters: ItemFilters, skip: int = 0, limit: int = 100, user_id: Optional[int] = None):
     query = db.query(Item)
 
     # Dynamically add favorite status if user is logged in
@@ -129,8 +129,8 @@ def list_items(db: Session, filters: dict, skip: int = 0, limit: int = 100, user
             ),
         )
 
-    # Apply filters from the dictionary
-    if q := filters.get("q"):
+    # Apply filters
+    if q := filters.q:
         query = query.filter(
             or_(
                 Item.name.ilike(f"%{q}%"),
@@ -138,23 +138,23 @@ def list_items(db: Session, filters: dict, skip: int = 0, limit: int = 100, user
                 Item.brand.ilike(f"%{q}%"),
             )
         )
-    if category := filters.get("category"):
+    if category := filters.category:
         query = query.filter(Item.category.ilike(f"%{category}%"))
-    if style := filters.get("style"):
+    if style := filters.style:
         query = query.filter(Item.style.ilike(f"%{style}%"))
-    if collection := filters.get("collection"):
+    if collection := filters.collection:
         query = query.filter(Item.collection.ilike(f"%{collection}%"))
-    if min_price := filters.get("min_price"):
+    if min_price := filters.min_price:
         query = query.filter(Item.price >= min_price)
-    if max_price := filters.get("max_price"):
+    if max_price := filters.max_price:
         query = query.filter(Item.price <= max_price)
-    if size := filters.get("size"):
+    if size := filters.size:
         query = query.filter(Item.size.ilike(f"%{size}%"))
-    if clothing_type := filters.get("clothing_type"):
+    if clothing_type := filters.clothing_type:
         query = query.filter(Item.clothing_type.ilike(f"%{clothing_type}%"))
 
     # Apply sorting
-    if sort_by := filters.get("sort_by"):
+    if sort_by := filters.sort_by:
         if sort_by == "price_asc":
             query = query.order_by(Item.price.asc())
         elif sort_by == "price_desc":
@@ -550,6 +550,7 @@ def import_items_from_lamoda(db: Session, query: str, limit: int = 20, domain: s
             return saved_items
         finally:
             await parser.close()
+            await LamodaParser.aclose_shared()
     
     # Запускаем асинхронную функцию
     return asyncio.run(_fetch_and_save()) 
\ No newline at end of file
@@ -1,6 +1,11 @@
+import hashlib
+import threading
+import time
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 
+from cachetools import TLRUCache
+
 from fastapi import HTTPException, status, Depends, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt, JWTError
@@ -11,6 +16,7 @@ from app.core.config import get_settings
 from app.core.database import get_db
 from app.db.models.user import User
 from app.core.redis_client import get_redis
+from app.core.token_cache import is_blacklisted, mark_blacklisted
 
 settings = get_settings()
 
@@ -47,12 +53,31 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 
+def _decoded_ttu(_key: bytes, payload: dict, now: float) -> float:
+    # Keep a verified payload for at most a minute and never past its own exp
+    exp = payload.get("exp")
+    return min(now + 60, exp) if isinstance(exp, (int, float)) else now + 60
+
+
+# Verified payloads keyed by a blake2b digest of the token. Revocation is
+# checked separately (is_token_blacklisted) before the payload is trusted.
+_decoded_tokens: "TLRUCache[bytes, dict]" = TLRUCache(maxsize=10_000, ttu=_decoded_ttu, timer=time.time)
+_decoded_lock = threading.Lock()
+
+
 def decode_token(token: str) -> dict:
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    with _decoded_lock:
+        payload = _decoded_tokens.get(key)
+    if payload is not None:
+        return dict(payload)
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    with _decoded_lock:
+        _decoded_tokens[key] = payload
+    return dict(payload)
 
 
 def blacklist_token(token: str, ttl: int | None = None) -> None:
@@ -64,14 +89,14 @@ def blacklist_token(token: str, ttl: int | None = None) -> None:
         redis_client.setex(key, ttl, "1")
     else:
         redis_client.set(key, "1")
+    mark_blacklisted(key)
 
 
 def is_token_blacklisted(token: str) -> bool:
     """Return True if the token is present in Redis blacklist."""
     if not token:
         return False
-    redis_client = get_redis()
-    return redis_client.exists(f"token_blacklist:{token}") == 1
+    return is_blacklisted(f"token_blacklist:{token}")
 
 
 async def get_current_user(
@@ -122,13 +147,13 @@ def blacklist_refresh_token(token: str, ttl: int | None = None) -> None:
         redis_client.setex(key, ttl, "1")
     else:
         redis_client.set(key, "1")
+    mark_blacklisted(key)
 
 
 def is_refresh_token_blacklisted(token: str) -> bool:
     if not token:
         return False
-    redis_client = get_redis()
-    return redis_client.exists(f"refresh_token_blacklist:{token}") == 1
+    return is_blacklisted(f"refresh_token_blacklist:{token}")
 
 
 def decode_refresh_token(token: str) -> dict:
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from cachetools import TTLCache
+
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Revocations are broadcast on this channel so every worker drops a stale
+# "not revoked" answer immediately instead of waiting for the TTL.
+REVOKED_CHANNEL = "token_blacklist:revoked"
+
+# Pause between attempts to (re)subscribe while Redis is unavailable
+LISTENER_RETRY_SECONDS = 5.0
+
+_cache: "TTLCache[str, bool]" = TTLCache(maxsize=50_000, ttl=30)
+_lock = threading.Lock()
+
+# Listener state is guarded by _lock too: a cached "not revoked" answer is
+# only trustworthy while revocation broadcasts are actually being received.
+_listener: Optional[threading.Thread] = None
+_listener_retry_at = 0.0
+_start_lock = threading.Lock()
+
+
+def _listener_healthy() -> bool:
+    return _listener is not None and _listener.is_alive()
+
+
+def is_blacklisted(key: str) -> bool:
+    """Return True if the Redis blacklist key exists.
+
+    Hits are always cached; misses only while the invalidation listener is
+    running, otherwise every lookup goes to Redis.
+    """
+    healthy = _ensure_listener()
+    with _lock:
+        cached = _cache.get(key)
+    if cached or (cached is not None and healthy):
+        return cached
+    revoked = get_redis().exists(key) == 1
+    with _lock:
+        if revoked:
+            _cache[key] = True
+        elif _listener_healthy():
+            # Never overwrite a revocation recorded by _on_revoked meanwhile
+            return _cache.setdefault(key, False)
+    return revoked
+
+
+def mark_blacklisted(key: str) -> None:
+    """Record a revocation locally and notify sibling workers."""
+    with _lock:
+        _cache[key] = True
+    get_redis().publish(REVOKED_CHANNEL, key)
+
+
+def _on_revoked(message: dict) -> None:
+    with _lock:
+        _cache[message["data"]] = True
+
+
+def _on_listener_error(exc: BaseException, pubsub, thread) -> None:
+    """Broadcasts may have been missed: drop cached misses and resubscribe later."""
+    global _listener, _listener_retry_at
+    logger.warning("Token revocation listener failed, falling back to Redis lookups: %s", exc)
+    thread.stop()
+    with _lock:
+        if _listener is thread:
+            _listener = None
+        _listener_retry_at = time.monotonic() + LISTENER_RETRY_SECONDS
+        _cache.clear()
+
+
+def _ensure_listener() -> bool:
+    """Return True if the listener is running, restarting it (rate-limited) if not."""
+    if _listener_healthy():
+        return True
+    if time.monotonic() < _listener_retry_at:
+        return False
+    return start_invalidation_listener()
+
+
+def start_invalidation_listener() -> bool:
+    """Subscribe to revocation broadcasts in a background thread (idempotent).
+
+    Returns False (and logs) when Redis is unreachable; is_blacklisted then
+    skips negative caching and retries the subscription periodically.
+    """
+    global _listener, _listener_retry_at
+    with _start_lock:
+        if _listener_healthy():
+            return True
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{REVOKED_CHANNEL: _on_revoked})
+            thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True, exception_handler=_on_listener_error)
+        except Exception as e:
+            logger.warning("Could not subscribe to token revocations, caching only hits: %s", e)
+            with _lock:
+                _listener_retry_at = time.monotonic() + LISTENER_RETRY_SECONDS
+            return False
+        with _lock:
+            # Misses cached before the subscription may predate a missed broadcast
+            _cache.clear()
+            _listener = thread
+        return True
+
+
+def stop_invalidation_listener() -> None:
+    global _listener
+    with _start_lock, _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        _cache.clear()
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Depends
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.api.v1.api import api_router as api_v1_router
@@ -12,7 +13,7 @@ from app.db.models.user import User
 
 settings = get_settings()
 
-app = FastAPI(title=settings.PROJECT_NAME)
+app = FastAPI(title=settings.PROJECT_NAME, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -48,6 +49,27 @@ def create_default_admin():
         pass
     db.close()
 
+@app.on_event("startup")
+def subscribe_token_revocations():
+    from app.core.token_cache import start_invalidation_listener
+    # Logs and falls back to uncached misses if Redis is down; retried on lookup
+    start_invalidation_listener()
+
+@app.on_event("shutdown")
+async def close_parsers():
+    from app.agents.catalog_parser import shutdown
+    await shutdown()
+
+@app.on_event("shutdown")
+async def close_google_http():
+    from app.api.v1.endpoints.auth.service import aclose_google_http
+    await aclose_google_http()
+
+@app.on_event("shutdown")
+def unsubscribe_token_revocations():
+    from app.core.token_cache import stop_invalidation_listener
+    stop_invalidation_listener()
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "ok", "message": "Service is running"}
@@ -0,0 +1,76 @@
+import asyncio
+import concurrent.futures
+
+from app.agents import catalog_parser
+
+
+class _StubSearchParser:
+    """Stands in for LamodaParser: counts searches and yields fixed results."""
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = 0
+
+    async def aiter_search(self, query, limit=20, page=1):
+        self.calls += 1
+        for product in self.results[:limit]:
+            # Yield control so the concurrent search reaches the lock meanwhile
+            await asyncio.sleep(0)
+            yield product
+
+
+async def _collect(parser, query, domain, limit):
+    return [p async for p in catalog_parser._iter_catalog(parser, query, domain, limit)]
+
+
+def test_concurrent_identical_searches_share_one_scrape():
+    catalog_parser._search_cache.clear()
+    parser = _StubSearchParser(["a", "b", "c"])
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(
+                _collect(parser, "nike", "kz", 2),
+                _collect(parser, "nike", "kz", 2),
+            ),
+            timeout=5,
+        )
+
+    first, second = asyncio.run(run())
+
+    assert first == second == ["a", "b"]
+    assert parser.calls == 1
+    assert ("nike", "kz", 2) not in catalog_parser._search_locks
+
+
+class _BrokenPool(concurrent.futures.Executor):
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, fn, *args, **kwargs):
+        raise concurrent.futures.BrokenExecutor("worker died")
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.shut_down = True
+
+
+class _StubItemParser:
+    domain = "kz"
+
+    async def fetch_page(self, url):
+        return b"<html></html>"
+
+
+def test_broken_pool_is_replaced_and_card_parsed_in_process(monkeypatch):
+    pool = _BrokenPool()
+    monkeypatch.setattr(catalog_parser, "_executor", pool)
+    monkeypatch.setattr(catalog_parser, "parse_product_html", lambda content, url, domain: ("parsed", url))
+
+    url = "https://www.lamoda.kz/p/abc123/"
+    details = asyncio.run(
+        catalog_parser._parse_single_item(_StubItemParser(), url, catalog_parser.DynamicLimiter(1), executor=pool)
+    )
+
+    assert details == ("parsed", url)
+    assert pool.shut_down
+    assert catalog_parser._executor is None
@@ -0,0 +1,11 @@
+from app.agents.parser_agent import _BRAND_RE, _split_brand_and_name
+
+
+def test_brand_inside_a_word_is_not_matched():
+    assert _BRAND_RE.search("Sneakers Filament black") is None
+    assert _BRAND_RE.search("Numerous colors Converse").group() == "Converse"
+
+
+def test_brand_as_a_separate_word_is_matched():
+    assert _split_brand_and_name("Кроссовки Nike Air Max 90")[0] == "Nike"
+    assert _split_brand_and_name("Numerous colors Converse Chuck Taylor") == ("Converse", "Chuck Taylor")